@@ -1,143 +1,350 @@
-import sys
+import argparse
 import os
 import time
-import tracemalloc
-from collections import defaultdict
+from collections import Counter, defaultdict
 from itertools import combinations
+from encoding import load_horizontal
+from sinks import OUTPUTS, ListSink, make_sink
+from rules import IndexingSink, SupportIndex, rules_path, write_rules
+from instrument import MEMORY_TRACKERS, Trace, make_tracker, trace_path
+from cache import CachingSink, ResultCache
+
+ENGINES = ("trie", "loop", "numpy")
+
+# numpy engine (NumPy 2.0 or later): candidates are counted in batches of at most this many bytes of packed rows
+BATCH_BYTES = 1 << 24
+
+# Prefix trie over sorted candidates, so a transaction only walks the branches it can contain
+class CandidateTrie:
+    def __init__(self, candidates, k):
+        self.k = k # size of every candidate in the trie
+        self.root = {} # item -> child node, the last level maps item -> candidate
+        self.counts = defaultdict(int) # candidate -> support count
+        self.items = set() # items that occur in at least one candidate
+        for candidate in candidates: #candidates are sorted tuples
+            node = self.root
+            self.items.update(candidate)
+            for item in candidate[:-1]:
+                node = node.setdefault(item, {})
+            node[candidate[-1]] = candidate
+
+    # Count every candidate contained in a sorted transaction, weight times
+    def count(self, transaction, weight=1):
+        # items outside every candidate can never lead to a leaf
+        transaction = [item for item in transaction if item in self.items]
+        if len(transaction) >= self.k:
+            positions = {item: i for i, item in enumerate(transaction)}
+            self._count(self.root, transaction, positions, 0, 1, weight)
+
+    def _count(self, node, transaction, positions, start, depth, weight):
+        # leave enough items after position i to complete the candidate
+        stop = len(transaction) - self.k + depth
+        if len(node) < stop - start:
+            # fewer children than reachable items: look each child up in the transaction
+            for item, child in node.items():
+                i = positions.get(item)
+                if i is not None and start <= i < stop:
+                    if depth == self.k:
+                        self.counts[child] += weight
+                    else:
+                        self._count(child, transaction, positions, i + 1, depth + 1, weight)
+        else:
+            # fewer reachable items than children: look each item up in the node
+            for i in range(start, stop):
+                child = node.get(transaction[i])
+                if child is not None:
+                    if depth == self.k:
+                        self.counts[child] += weight
+                    else:
+                        self._count(child, transaction, positions, i + 1, depth + 1, weight)
 
 class Apriori:
-    def __init__(self, minsup):
+    def __init__(self, minsup, engine="trie", output="memory", sink=None, min_conf=None, memory="tracemalloc", trace=False, cache=None):
         self.minsup = minsup # minimum support threshold
-        self.horizontal_db = [] # horizontal transactions: list of sets of items
-        self.frequent_itemsets = [] # stores frequent itemsets and their support count
+        self.output = output # where itemsets go: "memory", "text", "binary" or "count"
+        self.sink = sink # receives itemsets while mining, built from output when not given
+        self.engine = engine # support counting engine: "trie" (default), "loop" (reference) or "numpy"
+        self.matrix = None # numpy engine: frequent item id - first_row -> bits of the horizontal_db entries holding it (packed uint8 rows)
+        self.first_row = 0 # numpy engine: id of the least frequent frequent item, the matrix's first row
+        self.weight_groups = [] # numpy engine: (weight, first byte, end byte) of the matrix columns of each weight
+        self.horizontal_db = [] # distinct horizontal transactions: list of sorted tuples of item ids
+        self.weights = [] # number of transactions behind each entry of horizontal_db
+        self.num_transactions = 0
+        self.db_sizes = [] # entries of the working database counted at each level
+        self.encoder = None # item label <-> item id dictionary
+        self.frequent_itemsets = [] # stores frequent itemsets and their support count (when output is "memory")
         self.stats = {} #stores performance metrics (runtime, memory)
+        self.min_conf = min_conf #confidence threshold of the rule stage, None skips it
+        self.support_index = None #itemset -> support, for the rule stage
+        self.num_rules = 0
+        self.memory = memory # memory tracking: "tracemalloc", "rss" (sampled) or "none"
+        self.trace = Trace() if trace else None # counters per level, None skips the bookkeeping
+        self.cache = cache # ResultCache answering repeated runs, None mines every time
+        self.cached = None # cached run this run was answered from
+        self.cache_input = None # file the cache entry is keyed on when the input is a converted copy of it
 
  # Load data in horizontal format
     def load_horizontal_data(self, filepath):
         start_time = time.time()
-        transactions = []
+        self.encoder, transactions = load_horizontal(filepath)
+        self.num_transactions = len(transactions)
+        # identical transactions collapse into one weighted entry, dense data repeats many of them
+        counts = Counter(transactions)
+        self.weights = list(counts.values())
+        if self.engine == "numpy":
+            self.build_matrix(list(counts))
+        self.stats["load_time"] = time.time() - start_time
+        return list(counts)
 
-        with open(filepath, 'r') as f:
-            for line in f:
-                    transaction = frozenset(line.strip().split(" "))
-                    transactions.append(transaction)
+# numpy engine: pack the item x transaction incidence matrix of the distinct transactions once, row i holds a bit
+# per entry of horizontal_db that contains item first_row + i; entries are grouped by weight, each group starting
+# on a byte, so a support is a popcount per group times its weight
+# only the frequent items get a row (ids follow ascending support, so they are the ids from first_row up), and
+# bits are set straight into the packed rows
+    def build_matrix(self, transactions):
+        import numpy as np # optional, only the numpy engine needs it
+        by_weight = defaultdict(list)
+        for entry, weight in enumerate(self.weights):
+            by_weight[weight].append(entry)
+        column = np.zeros(len(transactions), dtype=np.intp) # entry -> bit position
+        self.weight_groups = [] # (weight, first byte, end byte)
+        position = 0
+        for weight, entries in sorted(by_weight.items()):
+            column[entries] = np.arange(position, position + len(entries))
+            self.weight_groups.append((weight, position // 8, (position + len(entries) + 7) // 8))
+            position = (position + len(entries) + 7) // 8 * 8
 
-        self.stats["load_time"] = time.time() - start_time
-        return transactions
+        items = np.fromiter((item for transaction in transactions for item in transaction), dtype=np.intp)
+        owners = np.repeat(np.arange(len(transactions)), [len(transaction) for transaction in transactions]) # entry of each item
+        supports = np.bincount(items, weights=np.array(self.weights)[owners], minlength=len(self.encoder.labels))
+        frequent = np.flatnonzero(supports >= self.minsup)
+        self.first_row = int(frequent[0]) if len(frequent) else len(self.encoder.labels)
+        keep = items >= self.first_row
+        rows, columns = items[keep] - self.first_row, column[owners[keep]]
+        self.matrix = np.zeros((len(self.encoder.labels) - self.first_row, position // 8), dtype=np.uint8)
+        np.bitwise_or.at(self.matrix, (rows, columns >> 3), (0x80 >> (columns & 7)).astype(np.uint8))
+
+# Shrink the working database before counting (k+1)-candidates: items outside every candidate are dropped,
+# and a transaction left with k items or fewer cannot contain a candidate
+    def trim_database(self, candidates, k):
+        keep = {item for candidate in candidates for item in candidate}
+        counts = defaultdict(int) # transactions trimmed to the same items merge again
+        for transaction, weight in zip(self.horizontal_db, self.weights):
+            trimmed = tuple(item for item in transaction if item in keep)
+            if len(trimmed) > k:
+                counts[trimmed] += weight
+        self.horizontal_db = list(counts)
+        self.weights = list(counts.values())
 
 # Compute supports for a set of candidates
     def get_candidate_supports(self, candidates):
+        if self.engine == "loop":
+            return self.get_candidate_supports_loop(candidates)
+        if self.engine == "numpy":
+            return self.get_candidate_supports_numpy(candidates)
+        if not candidates:
+            return defaultdict(int)
+
+        k = len(next(iter(candidates)))
+        trie = CandidateTrie(candidates, k)
+        for transaction, weight in zip(self.horizontal_db, self.weights):
+            trie.count(transaction, weight)
+        return trie.counts
+
+# Reference engine: test every candidate against every transaction
+    def get_candidate_supports_loop(self, candidates):
         support_dict = defaultdict(int)
-        for transaction in self.horizontal_db:
+        for transaction, weight in zip(self.horizontal_db, self.weights):
             for candidate in candidates:
                 if set(candidate).issubset(transaction):
-                    support_dict[candidate] += 1
+                    support_dict[candidate] += weight
         return support_dict
-    
+
+# numpy engine: AND the packed rows of each candidate's items for a batch of candidates at a time, then popcount
+    def get_candidate_supports_numpy(self, candidates):
+        import numpy as np
+        support_dict = defaultdict(int)
+        if not candidates:
+            return support_dict
+        batch = max(1, BATCH_BYTES // max(1, self.matrix.shape[1]))
+        for start in range(0, len(candidates), batch):
+            chunk = candidates[start:start + batch]
+            items = np.array(chunk, dtype=np.intp) - self.first_row # one matrix row per item of each candidate
+            bits = self.matrix[items[:, 0]]
+            for j in range(1, items.shape[1]):
+                np.bitwise_and(bits, self.matrix[items[:, j]], out=bits)
+            supports = np.zeros(len(chunk), dtype=np.int64)
+            for weight, first, end in self.weight_groups:
+                supports += weight * np.bitwise_count(bits[:, first:end]).sum(axis=1, dtype=np.int64)
+            support_dict.update(zip(chunk, supports.tolist()))
+        return support_dict
+
+# Join frequent k-itemsets that share their first k-1 items into (k+1)-candidates
+    def generate_candidates(self, items):
+        # make set of items for easy frequent item checking
+        items_set = set(items)
+        # group itemsets (sorted tuples) by their shared prefix
+        prefix_groups = defaultdict(list)
+        for itemset in items:
+            prefix_groups[itemset[:-1]].append(itemset[-1])
+
+        candidates = []
+        joined = 0 # pairs joined before the subset check
+        for prefix, last_items in prefix_groups.items():
+            joined += len(last_items) * (len(last_items) - 1) // 2
+            last_items.sort()
+            for i in range(len(last_items) - 1):
+                for j in range(i + 1, len(last_items)):
+                    candidate = prefix + (last_items[i], last_items[j])
+                    # the subsets dropping either of the last two items are the joined itemsets,
+                    # so only the subsets dropping a prefix item need to be looked up
+                    if all(candidate[:d] + candidate[d + 1:] in items_set for d in range(len(prefix))):
+                        candidates.append(candidate)
+        if self.trace is not None and candidates: # a level without candidates is not mined, so not traced
+            self.trace.record(len(candidates[0]), pruned=joined - len(candidates))
+        return candidates
+
 # Enumerate frequent itemsets
     def enumerate(self):
+        level_start = time.perf_counter()
         # count supports of frequent 1-itemsets
         support_dict = defaultdict(int)
-        for transaction in self.horizontal_db:
+        self.db_sizes.append(len(self.horizontal_db))
+        for transaction, weight in zip(self.horizontal_db, self.weights):
             for item in transaction:
-                support_dict[frozenset([item])] += 1
+                support_dict[(item,)] += weight
 
-        # filter 1-itemsets by minsup
-        items = [frozenset(item) for item in support_dict if support_dict[item] >= self.minsup]
+        # filter 1-itemsets by minsup, itemsets are kept as sorted tuples of items
+        items = [item for item in support_dict if support_dict[item] >= self.minsup]
         items.sort()
 
-        # add the frequent itemsets and their supports into the frequent itemsets
-        self.frequent_itemsets += [(item, support_dict[item]) for item in items]
-
-        # size of itemsets in current layer
-        k = 1
+        # emit the frequent itemsets and their supports
+        for item in items:
+            self.sink.emit(item, support_dict[item])
+        if self.trace is not None:
+            self.record_level(1, level_start, len(support_dict), len(items))
 
         # while there are still itemsets to attempt to generate candidates from
         while(len(items) > 0):
-            # reset candidates and noncandidates
-            candidates = set()
-            noncandidates = set()
-            # make set of items for easy frequent item checking
-            items_set = set(items)
-
-            # for every pair of itemsets...
-            for i in range(0,len(items)-1):
-                for j in range(1,len(items)):
-                    # get the union of the items
-                    union = items[i] | items[j]
-                    # if the union is the right size...
-                    if len(union) == k+1:
-                        # no need to check candidate further if its made of size 1 items
-                        if k == 1:
-                            candidates.add(frozenset(union))
-                        else:
-                            # if it hasn't already been generated as a candidate or noncandidate...
-                            if not (union in candidates) and not (union in noncandidates):
-                                # check if it's a valid candidate
-                                # if all the size k-1 subsets of the union are frequent then it is a candidate 
-                                all_freq = True
-                                for union_item in union:
-                                    if not((union - set([union_item])) in items_set):
-                                        noncandidates.add(frozenset(union))
-                                        all_freq = False
-                                        break
-                                if all_freq:
-                                    candidates.add(frozenset(union))
-
-            # increment itemset size
-            k += 1
+            level_start = time.perf_counter()
+            candidates = self.generate_candidates(items)
+            if not candidates:
+                break
+            if self.engine != "numpy": # the matrix is built once, its batches do not shrink with the database
+                self.trim_database(candidates, len(items[0]))
+            self.db_sizes.append(len(self.horizontal_db))
             # count candidate supports
             support_dict = self.get_candidate_supports(candidates)
-            # update items
-            items = [frozenset(item) for item in support_dict if support_dict[item] >= self.minsup]
-            # add the frequent itemsets and their supports into the frequent itemsets
-            self.frequent_itemsets += [(item, support_dict[item]) for item in items]
+            # update items, candidates are generated in sorted order so items stay sorted
+            items = [item for item in candidates if support_dict[item] >= self.minsup]
+            # emit the frequent itemsets and their supports
+            for item in items:
+                self.sink.emit(item, support_dict[item])
+            if self.trace is not None and candidates:
+                self.record_level(len(candidates[0]), level_start, len(candidates), len(items))
+
+# Add a finished level to the trace
+    def record_level(self, k, level_start, num_candidates, num_frequent):
+        self.trace.record(k, time.perf_counter() - level_start, candidates=num_candidates,
+                          infrequent=num_candidates - num_frequent, frequent=num_frequent)
+        self.trace.span(f"level {k}", level_start, candidates=num_candidates, frequent=num_frequent)
 
 # Run the algorithm
     def run(self, filepath):
-        tracemalloc.start() #start memory tracking
-        self.horizontal_db = self.load_horizontal_data(filepath) #load dataset
+        memory_tracker = make_tracker(self.memory) #start memory tracking
+        memory_tracker.start()
+        if self.cache is not None:
+            self.cached = self.cache.lookup(self.cache_input or filepath, self.minsup)
+        if self.cached is not None:
+            self.encoder, self.num_transactions = self.cached.encoder, self.cached.num_transactions
+        else:
+            self.horizontal_db = self.load_horizontal_data(filepath) #load dataset
+
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        if self.min_conf is not None:
+            self.support_index = SupportIndex()
+            self.sink = IndexingSink(self.sink, self.support_index) #rules need the support of every itemset
+        if self.cache is not None and self.cached is None:
+            self.sink = CachingSink(self.sink, self.cache, self.cache_input or filepath, self.minsup, "all", self.num_transactions)
 
         start_time = time.time() # start timing
 
-        self.enumerate() #run apriori
+        self.sink.open(self.encoder)
+        if self.cached is not None:
+            self.cached.replay(self.sink, self.minsup) #itemsets of a cached run at this or a lower minsup
+        else:
+            self.enumerate() #run apriori
+        self.sink.close()
         self.stats["mining_time"] = time.time() - start_time #track mining runtime
-        self.stats["peak_memory_MB"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
-        tracemalloc.stop()
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+        if self.min_conf is not None:
+            start_time = time.time()
+            self.num_rules = write_rules(self.support_index, self.min_conf, self.encoder.decode, rules_path(self.output_path(filepath)))
+            self.stats["rule_gen_time"] = time.time() - start_time
+        if self.trace is not None:
+            self.trace.export(trace_path(self.output_path(filepath)))
+
+    def output_path(self, input_path):
+        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+        return f"Results/{dataset_name}_apriori_{self.minsup}_output.txt"
 
 # Output frequent itemsets and performance metrics
     def print_results(self, input_path):
-        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = f"Results/{dataset_name}_apriori_{self.minsup}_output.txt"
+        output_path = self.output_path(input_path)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        with open(output_path, "w") as f:
-            f.write("== Frequent Itemsets ==\n")
-            for itemset, support in self.frequent_itemsets:
-                f.write(f"{' '.join(itemset)} ({support})\n")
+        # a text sink already streamed the itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
 
             f.write("\n== Execution Statistics ==\n")
             f.write(f"Transactions: {self.estimate_num_transactions()}\n")
             f.write(f"Min Support: {self.minsup}\n")
+            f.write(f"Memory Tracking: {self.memory}\n")
+            if self.cached is not None:
+                f.write(f"Answered From Cache: {self.cached.path} (minsup {self.cached.minsup})\n")
+            else:
+                f.write(f"Database Entries Per Level: {' '.join(map(str, self.db_sizes))}\n")
+            if self.min_conf is not None:
+                f.write(f"Rules: {self.num_rules} at min confidence {self.min_conf}, written to {rules_path(output_path)}\n")
             for k, v in self.stats.items():
                 label = k.replace("_", " ").title()
-                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n")
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n" if k.endswith("MB") else f"{label}: {v}\n")
+            if self.trace is not None:
+                self.trace.write_levels(f)
+                f.write(f"Trace written to: {trace_path(output_path)}\n")
 
         print(f"Results written to: {output_path}")
 
  # Count number of transactions (for scalability reporting)
     def estimate_num_transactions(self):
-        return len(self.horizontal_db)
+        return self.num_transactions
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python apriori.py <horizontal_data_file> <minsup>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python apriori.py <horizontal_data_file> <minsup> [--engine trie|loop|numpy] [--output text|binary|count] [--min-conf C] [--memory tracemalloc|rss|none] [--trace] [--cache]")
+    parser.add_argument("filepath")
+    parser.add_argument("minsup", type=int)
+    parser.add_argument("--engine", choices=ENGINES, default="trie") #loop is the original nested-loop counter, numpy counts batches of candidates
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--min-conf", type=float) #also generate association rules at this confidence
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc") #rss samples the process instead of tracing allocations
+    parser.add_argument("--trace", action="store_true") #count candidates per level and export a trace
+    parser.add_argument("--cache", action="store_true") #answer from and add to the result cache
+    args = parser.parse_args()
 
-    filepath = sys.argv[1]
-    minsup = int(sys.argv[2])
+    filepath = args.filepath
+    minsup = args.minsup
 
-    apriori = Apriori(minsup)
+    apriori = Apriori(minsup, engine=args.engine, output=args.output, min_conf=args.min_conf, memory=args.memory, trace=args.trace, cache=ResultCache() if args.cache else None)
     apriori.run(filepath)
     apriori.print_results(filepath)
\ No newline at end of file
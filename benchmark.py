@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from instrument import MEMORY_TRACKERS
+
+DATASET_DIR = "Datasets"
+OUTPUT_JSON = "benchmark_summary.json"
+OUTPUT_CSV = "benchmark_summary.csv"
+
+ALGORITHMS = ("apriori", "eclat", "declat", "fpgrowth")
+DATASETS = ("chess", "mushroom", "retail", "connect")
+SUPPORTS = (3000, 1500, 1000)
+
+# Input layout each algorithm reads
+LAYOUTS = {"apriori": "horizontal", "eclat": "vertical", "declat": "vertical", "fpgrowth": "horizontal"}
+
+# Every (algorithm, dataset, minsup) run goes in its own subprocess, so a run can be killed at its timeout,
+# pinned to CPUs, and measured for peak RSS without the other runs' memory
+
+# Dataset file of an algorithm, the .csr copy when fmt is "csr"
+def dataset_path(dataset, algorithm, fmt="text"):
+    if fmt == "csr":
+        return f"{DATASET_DIR}/{dataset}.csr"
+    return f"{DATASET_DIR}/{dataset}_{LAYOUTS[algorithm]}.dat"
+
+# Peak resident set size of this process in MB (ru_maxrss is in KB on Linux, bytes on macOS)
+def peak_rss_mb():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+# Run one miner in this process and print its stats as a JSON line (the subprocess side of a trial)
+# pinning needs os.sched_setaffinity (Linux), elsewhere the trial runs unpinned and says so in its stats
+def run_trial(algorithm, filepath, minsup, cpus, memory):
+    pinning = pinning_status(cpus)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # itemsets are only counted, writing millions of them would time the disk instead of the miner
+    if algorithm == "apriori":
+        from apriori import Apriori
+        miner = Apriori(minsup, output="count", memory=memory)
+        miner.run(filepath)
+    elif algorithm == "eclat":
+        from eclat import Eclat
+        miner = Eclat(output="count", memory=memory)
+        miner.run(filepath, minsup)
+    elif algorithm == "declat":
+        from dEclat import dEclat
+        miner = dEclat(minsup, output="count", memory=memory)
+        miner.run(filepath)
+    else:
+        from fpgrowth import FPGrowth
+        miner = FPGrowth(minsup, output="count", memory=memory)
+        miner.run(filepath)
+
+    stats = dict(miner.stats)
+    stats["itemsets"] = miner.sink.count
+    stats["transactions"] = miner.estimate_num_transactions()
+    stats["peak_rss_MB"] = peak_rss_mb()
+    stats["cpu_pinning"] = pinning
+    print(json.dumps(stats))
+
+# CPU pinning of a run: the pinned CPUs, "skipped" where the platform cannot pin, empty when not asked for
+def pinning_status(cpus):
+    if not cpus:
+        return ""
+    return ",".join(map(str, cpus)) if hasattr(os, "sched_setaffinity") else "skipped"
+
+# p-th percentile of values, by linear interpolation between the closest ranks
+def percentile(values, p):
+    values = sorted(values)
+    position = (len(values) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+# Run trials of one configuration, each in a fresh subprocess, returns the stats of every trial
+def run_config(algorithm, dataset, minsup, trials, timeout, cpus, fmt, memory):
+    filepath = dataset_path(dataset, algorithm, fmt)
+    command = [sys.executable, os.path.abspath(__file__), "--trial", algorithm, filepath, str(minsup), "--memory", memory]
+    if cpus:
+        command += ["--cpus", ",".join(map(str, cpus))]
+
+    runs = []
+    for trial in range(trials):
+        start_time = time.time()
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # a timed out configuration will time out again, skip its remaining trials
+            runs.append({"status": "timeout", "wall_time": time.time() - start_time})
+            break
+        wall_time = time.time() - start_time
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            runs.append({"status": "error", "wall_time": wall_time})
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        stats["status"] = "ok"
+        stats["wall_time"] = wall_time
+        runs.append(stats)
+    return runs
+
+# Median and p95 of the timings over the successful trials of one configuration
+def summarize(algorithm, dataset, minsup, runs):
+    ok = [run for run in runs if run["status"] == "ok"]
+    summary = {
+        "dataset": dataset,
+        "algorithm": algorithm,
+        "support_value": minsup,
+        "status": "ok" if len(ok) == len(runs) else runs[-1]["status"],
+        "trials": len(ok),
+        "cpu_pinning": ok[0]["cpu_pinning"] if ok else "",
+    }
+    if ok:
+        summary["transactions"] = ok[0]["transactions"]
+        summary["itemsets"] = ok[0]["itemsets"]
+        for key in ("wall_time", "load_time", "mining_time"):
+            values = [run[key] for run in ok]
+            summary[key] = round(statistics.median(values), 4)
+            summary[f"{key}_p95"] = round(percentile(values, 95), 4)
+        if "peak_memory_MB" in ok[0]:
+            summary["peak_memory_MB"] = max(run["peak_memory_MB"] for run in ok) #from the miner's --memory tracker
+        summary["peak_rss_MB"] = max(run["peak_rss_MB"] for run in ok)
+    return summary
+
+FIELDNAMES = [
+    "dataset", "algorithm", "support_value", "status", "trials", "transactions", "itemsets",
+    "wall_time", "wall_time_p95", "load_time", "load_time_p95", "mining_time", "mining_time_p95",
+    "peak_memory_MB", "peak_rss_MB", "cpu_pinning",
+]
+
+# Write the summaries to CSV (read by plots.py) and, with every trial, to JSON
+def write_summary(summaries, runs, json_path, csv_path):
+    with open(json_path, "w") as f:
+        json.dump({"summaries": summaries, "runs": runs}, f, indent=2)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python benchmark.py [--algorithms A ...] [--datasets D ...] [--supports S ...] [--trials N] [--timeout SECONDS] [--cpus 0,1] [--format text|csr] [--memory none|rss|tracemalloc]")
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS))
+    parser.add_argument("--supports", nargs="+", type=int, default=list(SUPPORTS))
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=1800) #seconds per trial, chess Apriori would run for hours
+    parser.add_argument("--cpus", type=lambda s: [int(cpu) for cpu in s.split(",")]) #pin every run to these CPUs
+    parser.add_argument("--format", choices=("text", "csr"), default="text") #dataset files to read
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="none") #peak RSS is always measured, tracemalloc slows the runs
+    parser.add_argument("--json", default=OUTPUT_JSON)
+    parser.add_argument("--csv", default=OUTPUT_CSV)
+    parser.add_argument("--trial", nargs=3, metavar=("ALGORITHM", "FILE", "MINSUP"), help=argparse.SUPPRESS) #subprocess side
+    args = parser.parse_args()
+
+    if args.trial:
+        algorithm, filepath, minsup = args.trial
+        run_trial(algorithm, filepath, int(minsup), args.cpus, args.memory)
+        sys.exit()
+
+    if pinning_status(args.cpus) == "skipped":
+        print("os.sched_setaffinity is not available on this platform, runs are not pinned to --cpus", file=sys.stderr)
+
+    summaries = []
+    all_runs = []
+    print(f"{'dataset':<10}{'algorithm':>10}{'minsup':>8}{'status':>9}{'median (s)':>12}{'p95 (s)':>10}{'RSS (MB)':>10}")
+    for dataset in args.datasets:
+        for algorithm in args.algorithms:
+            for minsup in args.supports:
+                runs = run_config(algorithm, dataset, minsup, args.trials, args.timeout, args.cpus, args.format, args.memory)
+                all_runs.extend({"dataset": dataset, "algorithm": algorithm, "support_value": minsup, **run} for run in runs)
+                summary = summarize(algorithm, dataset, minsup, runs)
+                summaries.append(summary)
+                print(f"{dataset:<10}{algorithm:>10}{minsup:>8}{summary['status']:>9}"
+                      f"{summary.get('wall_time', float('nan')):>12.4f}{summary.get('wall_time_p95', float('nan')):>10.4f}"
+                      f"{summary.get('peak_rss_MB', float('nan')):>10.2f}")
+
+    write_summary(summaries, all_runs, args.json, args.csv)
+    print(f"===Benchmark summary written to ./{args.csv} and ./{args.json}===")
@@ -0,0 +1,43 @@
+import sys
+from eclat import Eclat
+
+DATASET_DIR = "Datasets"
+
+# (dataset, minsup) pairs: dense chess and mushroom, sparse retail
+CONFIGS = [
+    ("chess", 3000),
+    ("chess", 2500),
+    ("mushroom", 3000),
+    ("mushroom", 1500),
+    ("retail", 3000),
+    ("retail", 1000),
+]
+
+# Run Eclat on one dataset with every fixed backend and compare timings and memory
+def benchmark(dataset, minsup):
+    filepath = f"{DATASET_DIR}/{dataset}_vertical.dat"
+    rows = []
+    results = {}
+
+    for backend in ("set", "bitset"):
+        eclat = Eclat(backend=backend)
+        eclat.run(filepath, minsup)
+        results[backend] = {(tuple(sorted(itemset)), support) for itemset, support in eclat.frequent_itemsets}
+        rows.append((dataset, minsup, backend, len(eclat.frequent_itemsets),
+                     eclat.stats["mining_time"], eclat.stats["peak_memory_MB"]))
+
+    # both backends must find exactly the same itemsets
+    if results["set"] != results["bitset"]:
+        print(f"!Backends disagree on {dataset} at minsup {minsup}!")
+    return rows
+
+if __name__ == "__main__":
+    # optionally restrict to the datasets given on the command line
+    datasets = sys.argv[1:]
+
+    print(f"{'dataset':<10}{'minsup':>8}{'backend':>9}{'itemsets':>10}{'mining (s)':>12}{'peak (MB)':>11}")
+    for dataset, minsup in CONFIGS:
+        if datasets and dataset not in datasets:
+            continue
+        for row in benchmark(dataset, minsup):
+            print(f"{row[0]:<10}{row[1]:>8}{row[2]:>9}{row[3]:>10}{row[4]:>12.4f}{row[5]:>11.2f}")
@@ -0,0 +1,274 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import Counter
+from encoding import ItemEncoder
+from sinks import BUFFER_SIZE
+
+# On-disk cache of mining results shared by the miners
+# frequent itemsets at minsup s are the itemsets with support >= s of any run at s' <= s (closed itemsets too),
+# so a run is answered from the cached run with the largest s' <= s, maximal itemsets only from a run at s itself
+# entries are keyed on a SHA-256 of the input file and the itemset mode, Apriori, Eclat, dEclat and FP-Growth
+# find the same frequent itemsets and share their entries
+#
+# entry file: header, item dictionary, support index, then the itemsets by descending support
+#   header: b"AAFC", version (uint16), transactions, minsup, number of labels (uint32 each)
+#   labels: uint16 length + utf-8 each, in item id order
+#   index: number of entries (uint32), then (support uint32, end offset uint64) for each distinct support,
+#          the end offset is where the itemsets with a lower support start
+#   record: itemset size (uint16), support (uint32), item ids (uint32 each), little endian, as in BinarySink
+# so a query at s reads only the records before the end offset of the smallest support >= s
+# a run's records are spooled to a temporary file as they are mined and sorted by support into the entry when
+# the run ends, the entry is written to a temporary file too and renamed into place
+
+CACHE_DIR = "Results/cache"
+MANIFEST = "manifest.json"
+MAX_BYTES = 1 << 30 #entries are evicted least recently used first beyond this size
+
+MAGIC = b"AAFC"
+VERSION = 1
+HEADER = struct.Struct("<4sHIII")
+INDEX_ENTRY = struct.Struct("<IQ")
+SORT_BYTES = 1 << 26 #records held in memory at once while an entry is sorted by support
+
+# SHA-256 of a file's contents
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# A cached run, its itemsets are read on demand
+class CachedResult:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, self.num_transactions, self.minsup, num_labels = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a cache entry")
+            labels = []
+            for _ in range(num_labels):
+                (length,) = struct.unpack("<H", f.read(2))
+                labels.append(f.read(length).decode("utf-8"))
+            (num_index,) = struct.unpack("<I", f.read(4))
+            index = [INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size)) for _ in range(num_index)]
+            self.start = f.tell() #first record
+        self.encoder = ItemEncoder.from_labels(labels)
+        self.supports = [-support for support, _ in index] #ascending, for bisect
+        self.ends = [end for _, end in index]
+
+    # (item ids, support) of every itemset with support >= minsup, by descending support
+    def itemsets(self, minsup):
+        count = bisect.bisect_right(self.supports, -minsup) #distinct supports >= minsup
+        if count == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.start)
+            data = f.read(self.ends[count - 1] - self.start)
+        position = 0
+        while position < len(data):
+            size, support = struct.unpack_from("<HI", data, position)
+            yield struct.unpack_from(f"<{size}I", data, position + 6), support
+            position += 6 + 4 * size
+
+    # Send the itemsets with support >= minsup to an open sink, returns how many
+    def replay(self, sink, minsup):
+        count = 0
+        for itemset, support in self.itemsets(minsup):
+            sink.emit(itemset, support)
+            count += 1
+        return count
+
+# (support, packed record) of every record in a file of packed records, in file order
+def read_records(path):
+    with open(path, "rb") as f:
+        data = b""
+        for chunk in iter(lambda: f.read(BUFFER_SIZE), b""):
+            data += chunk
+            position = 0
+            while position + 6 <= len(data):
+                size, support = struct.unpack_from("<HI", data, position)
+                end = position + 6 + 4 * size
+                if end > len(data):
+                    break #record continues in the next chunk
+                yield support, data[position:end]
+                position = end
+            data = data[position:]
+
+# Write a run's itemsets as an entry file, by descending support
+# records is a file of packed records in mining order and sizes the bytes of the records of each support,
+# the records are gathered one group of supports at a time (at most SORT_BYTES of them, one pass over the file
+# each) and keep their mining order within a support
+def write_entry(path, encoder, num_transactions, minsup, records, sizes):
+    supports = sorted(sizes, reverse=True)
+    labels = b"".join(struct.pack("<H", len(data)) + data for data in (label.encode("utf-8") for label in encoder.labels))
+    index = []
+    position = HEADER.size + len(labels) + 4 + INDEX_ENTRY.size * len(supports)
+    for support in supports:
+        position += sizes[support]
+        index.append((support, position))
+
+    with open(path, "wb", buffering=BUFFER_SIZE) as f:
+        f.write(HEADER.pack(MAGIC, VERSION, num_transactions, minsup, len(encoder.labels)))
+        f.write(labels)
+        f.write(struct.pack("<I", len(index)))
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+        start = 0
+        while start < len(supports):
+            end, group_bytes = start + 1, sizes[supports[start]]
+            while end < len(supports) and group_bytes + sizes[supports[end]] <= SORT_BYTES:
+                group_bytes += sizes[supports[end]]
+                end += 1
+            group = {support: [] for support in supports[start:end]}
+            for support, record in read_records(records):
+                if support in group:
+                    group[support].append(record)
+            for support in supports[start:end]:
+                f.write(b"".join(group[support]))
+            start = end
+
+# Cache directory with a JSON manifest of its entries
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.hashes = {} #path -> [size, mtime_ns, hash], files are only hashed again when they change
+        self.entries = [] #{"key", "mode", "minsup", "file", "bytes", "used"}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            self.hashes, self.entries = manifest["hashes"], manifest["entries"]
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump({"hashes": self.hashes, "entries": self.entries}, f)
+
+    def key(self, filepath):
+        info = os.stat(filepath)
+        path = os.path.abspath(filepath)
+        known = self.hashes.get(path)
+        if known is None or known[:2] != [info.st_size, info.st_mtime_ns]:
+            known = self.hashes[path] = [info.st_size, info.st_mtime_ns, file_hash(filepath)]
+        return known[2]
+
+    # Cached run that answers filepath at minsup in mode, or None
+    def lookup(self, filepath, minsup, mode="all"):
+        key = self.key(filepath)
+        usable = [entry for entry in self.entries if entry["key"] == key and entry["mode"] == mode and
+                  (entry["minsup"] == minsup or (mode != "maximal" and entry["minsup"] <= minsup))]
+        if not usable:
+            self.save() #keep the file's hash
+            return None
+        entry = max(usable, key=lambda entry: entry["minsup"]) #the fewest itemsets to skip
+        entry["used"] = time.time()
+        self.save()
+        return CachedResult(os.path.join(self.directory, entry["file"]))
+
+    # File name of the entry of filepath at minsup in mode
+    def entry_name(self, filepath, minsup, mode):
+        return f"{self.key(filepath)[:16]}_{mode}_{minsup}.bin"
+
+    # Store a run from its file of packed records and the bytes of each support (see write_entry),
+    # then evict least recently used entries beyond max_bytes
+    def store(self, filepath, minsup, mode, encoder, num_transactions, records, sizes):
+        key = self.key(filepath)
+        name = self.entry_name(filepath, minsup, mode)
+        path = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        write_entry(path + ".tmp", encoder, num_transactions, minsup, records, sizes)
+        os.replace(path + ".tmp", path) #a reader never sees a partly written entry
+        self.entries = [entry for entry in self.entries if entry["file"] != name]
+        self.entries.append({"key": key, "mode": mode, "minsup": minsup, "file": name,
+                             "bytes": os.path.getsize(os.path.join(self.directory, name)), "used": time.time()})
+        self.evict()
+        self.save()
+
+    def evict(self):
+        self.entries.sort(key=lambda entry: entry["used"])
+        while self.entries and sum(entry["bytes"] for entry in self.entries) > self.max_bytes:
+            self.remove(self.entries.pop(0))
+
+    def remove(self, entry):
+        path = os.path.join(self.directory, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Drop the entries of the given files (every entry when none are given), returns how many
+    def invalidate(self, filepaths=()):
+        keys = {self.key(filepath) for filepath in filepaths}
+        dropped = [entry for entry in self.entries if not keys or entry["key"] in keys]
+        for entry in dropped:
+            self.remove(entry)
+        self.entries = [entry for entry in self.entries if entry not in dropped]
+        self.save()
+        return len(dropped)
+
+# Pass itemsets on to sink while spooling them to a temporary file in the cache directory,
+# the entry is written from it when the sink closes
+class CachingSink:
+    def __init__(self, sink, cache, filepath, minsup, mode, num_transactions):
+        self.sink = sink
+        self.cache = cache
+        self.filepath = filepath
+        self.minsup = minsup
+        self.mode = mode
+        self.num_transactions = num_transactions
+        self.path = getattr(sink, "path", None) #results file a text sink streams into
+        self.encoder = None
+        self.records = None #spool file of packed records in mining order
+        self.records_path = None
+        self.sizes = Counter() #support -> bytes of its records
+
+    def open(self, encoder):
+        self.encoder = encoder
+        os.makedirs(self.cache.directory, exist_ok=True)
+        self.records_path = os.path.join(self.cache.directory, self.cache.entry_name(self.filepath, self.minsup, self.mode) + ".records")
+        self.records = open(self.records_path, "wb", buffering=BUFFER_SIZE)
+        self.sizes = Counter()
+        self.sink.open(encoder)
+
+    def emit(self, itemset, support):
+        record = struct.pack(f"<HI{len(itemset)}I", len(itemset), support, *itemset)
+        self.records.write(record)
+        self.sizes[support] += len(record)
+        self.sink.emit(itemset, support)
+
+    def close(self):
+        self.sink.close()
+        self.records.close()
+        try:
+            self.cache.store(self.filepath, self.minsup, self.mode, self.encoder, self.num_transactions, self.records_path, self.sizes)
+        finally:
+            os.remove(self.records_path)
+
+    def write_itemsets(self, f, decode):
+        self.sink.write_itemsets(f, decode)
+
+    @property
+    def count(self):
+        return self.sink.count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python cache.py list | clear [data_file ...]")
+    parser.add_argument("command", choices=("list", "clear"))
+    parser.add_argument("filepaths", nargs="*") #clear only these files' entries
+    parser.add_argument("--dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir)
+    if args.command == "clear":
+        print(f"{cache.invalidate(args.filepaths)} cache entries removed")
+    else:
+        files = {known[2]: path for path, known in cache.hashes.items()}
+        for entry in sorted(cache.entries, key=lambda entry: -entry["used"]):
+            print(f"{files.get(entry['key'], entry['key'][:16])} {entry['mode']} minsup {entry['minsup']}: {entry['bytes']} bytes")
+        print(f"Total: {sum(entry['bytes'] for entry in cache.entries)} of {cache.max_bytes} bytes")
@@ -0,0 +1,79 @@
+import heapq
+from collections import Counter, defaultdict
+
+# Condensed representations for the vertical miners
+#   closed:  no superset has the same support (CHARM)
+#   maximal: no superset is frequent (MaxEclat)
+# and the top-k mode, which keeps the k most frequent itemsets instead of those above a given minsup
+
+MODES = ("all", "closed", "maximal")
+
+# Closed itemsets found so far, indexed by (support, tidset key) for CHARM's subsumption check
+# the key is any value that is equal for equal tidsets, e.g. the sum of the TIDs
+class ClosedSets:
+    def __init__(self):
+        self.index = defaultdict(list) #(support, key) -> closed itemsets
+
+    # Record itemset unless a known closed superset has the same tidset, returns whether it was recorded
+    def add(self, itemset, support, key):
+        itemset = frozenset(itemset)
+        candidates = self.index[(support, key)]
+        for closed in candidates:
+            if itemset <= closed:
+                return False
+        candidates.append(itemset)
+        return True
+
+# Maximal itemsets found so far, indexed by item for superset lookups
+class MaximalSets:
+    def __init__(self):
+        self.by_item = defaultdict(list) #item -> maximal itemsets containing it
+
+    # Is every item of itemset inside one known maximal itemset?
+    def covers(self, itemset):
+        shortest = min((self.by_item.get(item, ()) for item in itemset), key=len)
+        itemset = set(itemset)
+        return any(itemset <= maximal for maximal in shortest)
+
+    def add(self, itemset):
+        itemset = frozenset(itemset)
+        for item in itemset:
+            self.by_item[item].append(itemset)
+
+# The k most frequent itemsets found so far, with every itemset tied with the k-th, in a min-heap on support
+# an itemset with less support than the k-th one can never enter, so its support is the miners' pruning threshold
+# (a subset has at least its superset's support, so raising minsup to it never prunes an itemset of the result)
+class TopK:
+    def __init__(self, k):
+        if k < 1:
+            raise ValueError(f"top-k needs k >= 1, got {k}")
+        self.k = k
+        self.heap = [] #(support, insertion order, itemset)
+        self.ties = Counter() #support -> itemsets in the heap with that support
+        self.order = 0
+
+    # Support every itemset of the result will have at least, once k itemsets are known
+    def threshold(self):
+        return self.heap[0][0] if len(self.heap) >= self.k else 0
+
+    # Lower bound on the final threshold from the supports of k or more itemsets known to exist (e.g. the items)
+    def seed(self, supports):
+        supports = heapq.nlargest(self.k, supports)
+        return supports[-1] if len(supports) == self.k else 0
+
+    # Record itemset, returns the raised threshold
+    def add(self, itemset, support):
+        heapq.heappush(self.heap, (support, self.order, tuple(itemset)))
+        self.order += 1
+        self.ties[support] += 1
+        # the lowest support drops out once the itemsets above it already make k
+        while len(self.heap) - self.ties[self.heap[0][0]] >= self.k:
+            lowest = self.heap[0][0]
+            while self.heap[0][0] == lowest:
+                heapq.heappop(self.heap)
+            del self.ties[lowest]
+        return self.threshold()
+
+    # (itemset, support) of the result, by descending support
+    def itemsets(self):
+        return [(list(itemset), support) for support, _, itemset in sorted(self.heap, key=lambda entry: (-entry[0], entry[1]))]
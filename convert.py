@@ -1,74 +1,161 @@
+import argparse
 import os
 import time
 import gzip
-from collections import defaultdict
+import heapq
+import tempfile
+import multiprocessing
+from collections import Counter, defaultdict
+from operator import itemgetter
+from encoding import BINARY_SUFFIX, ItemEncoder, write_binary
 
 DATASET_DIR = "Datasets"
+DATASETS = ["chess", "connect", "mushroom", "retail"]
 
-def extract_gz_file(gz_path, horizontal_path):
-    with gzip.open(gz_path, 'rt') as gz_file, open(horizontal_path, 'w') as out_file:
-        for line in gz_file:
-            out_file.write(line)
+SPILL_PAIRS = 5_000_000 #(item, tid) pairs held in memory before a sorted run is spilled to disk
 
-def convert_to_vertical_format(horizontal_path, vertical_path):
-    vertical_db = defaultdict(set)
+# Write one sorted run of tidlists (lines like "item: tid1,tid2,..", items in label order)
+def write_run(tid_lists, out_file):
+    for item in sorted(tid_lists):
+        out_file.write(f"{item}: {','.join(map(str, tid_lists[item]))}\n")
 
-    with open(horizontal_path, 'r') as file:
-        for tid, line in enumerate(file):
-            items = line.strip().split()
-            for item in items:
-                vertical_db[item].add(str(tid))
+def read_run(run_path):
+    with open(run_path, 'r') as run:
+        for line in run:
+            item, tids = line.rstrip("\n").split(": ", 1)
+            yield item, tids
 
+# Merge the spilled runs into the vertical file
+# runs hold consecutive TID ranges in order, so the tids of an item are the concatenation over the runs
+def merge_runs(run_paths, vertical_path):
+    merged = heapq.merge(*(read_run(run_path) for run_path in run_paths), key=itemgetter(0)) #ties keep run order
     with open(vertical_path, 'w') as out_file:
-        for item, tids in sorted(vertical_db.items()):
-            out_file.write(f"{item}: {','.join(sorted(tids))}\n")
-
-def process_dataset(base_name):
+        item, parts = None, []
+        for next_item, tids in merged:
+            if next_item != item:
+                if parts:
+                    out_file.write(f"{item}: {','.join(parts)}\n")
+                item, parts = next_item, []
+            parts.append(tids)
+        if parts:
+            out_file.write(f"{item}: {','.join(parts)}\n")
+
+# Stream the gzip file once, writing the horizontal file as it goes and collecting the tidlists
+# TIDs are line numbers (ints, so they are written in numeric order); the tidlists are spilled as
+# sorted runs whenever they reach spill_pairs pairs and merged at the end, so memory stays bounded
+# returns the support of every item
+def convert_gz(gz_path, horizontal_path, vertical_path, spill_pairs=SPILL_PAIRS):
+    supports = Counter()
+    tid_lists = defaultdict(list)
+    pairs = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(vertical_path) or ".") as spill_dir:
+        run_paths = []
+        with gzip.open(gz_path, 'rt') as gz_file, open(horizontal_path, 'w') as out_file:
+            for tid, line in enumerate(gz_file):
+                # an item repeated on a line occurs once in the transaction, the line is only rewritten then
+                items = line.split()
+                unique = list(dict.fromkeys(items))
+                if len(unique) < len(items):
+                    items = unique
+                    line = " ".join(items) + "\n"
+                out_file.write(line)
+                for item in items:
+                    tid_lists[item].append(tid)
+                supports.update(items)
+                pairs += len(items)
+                if pairs >= spill_pairs:
+                    run_paths.append(os.path.join(spill_dir, f"run{len(run_paths)}"))
+                    with open(run_paths[-1], 'w') as run:
+                        write_run(tid_lists, run)
+                    tid_lists.clear()
+                    pairs = 0
+
+        if not run_paths:
+            with open(vertical_path, 'w') as out_file:
+                write_run(tid_lists, out_file)
+        else:
+            if tid_lists:
+                run_paths.append(os.path.join(spill_dir, f"run{len(run_paths)}"))
+                with open(run_paths[-1], 'w') as run:
+                    write_run(tid_lists, run)
+            tid_lists.clear()
+            merge_runs(run_paths, vertical_path)
+    return supports
+
+# Binary CSR copy of the dataset that the miners mmap instead of parsing text
+# the supports from the streaming pass give the item ids, so the horizontal file is read once more without counting
+def convert_to_binary_format(horizontal_path, binary_path, supports):
+    encoder = ItemEncoder(supports)
+    ids = encoder.ids
+    with open(horizontal_path, 'r') as f:
+        write_binary(binary_path, encoder, (sorted(map(ids.__getitem__, line.split())) for line in f))
+
+def process_dataset(base_name, spill_pairs=SPILL_PAIRS):
     gz_path = os.path.join(DATASET_DIR, f"{base_name}.dat.gz")
     horizontal_path = os.path.join(DATASET_DIR, f"{base_name}_horizontal.dat")
     vertical_path = os.path.join(DATASET_DIR, f"{base_name}_vertical.dat")
+    binary_path = os.path.join(DATASET_DIR, f"{base_name}{BINARY_SUFFIX}")
 
-    print(f"\n[INFO] Processing {base_name}.dat.gz")
+    log = [f"\n[INFO] Processing {base_name}.dat.gz"]
 
     start_time = time.time()
 
-    # Step 1: Extract horizontal format
-    extract_gz_file(gz_path, horizontal_path)
-    print(f"✓ Extracted to {horizontal_path}")
+    # Step 1: Extract horizontal format and convert to vertical format in one pass
+    supports = convert_gz(gz_path, horizontal_path, vertical_path, spill_pairs)
+    log.append(f"✓ Extracted to {horizontal_path}")
+    log.append(f"✓ Converted to {vertical_path}")
 
-    # Step 2: Convert to vertical format
-    convert_to_vertical_format(horizontal_path, vertical_path)
-    print(f"✓ Converted to {vertical_path}")
+    # Step 2: Write the binary format
+    convert_to_binary_format(horizontal_path, binary_path, supports)
+    log.append(f"✓ Wrote {binary_path}")
 
     duration = time.time() - start_time
-    print(f"✓ Total conversion time: {duration:.2f} seconds")
+    log.append(f"✓ Total conversion time: {duration:.2f} seconds")
+    return "\n".join(log)
 
-if __name__ == "__main__":
-    datasets = ["chess", "connect", "mushroom", "retail"]
+def _process_dataset(args):
+    return process_dataset(*args)
 
-    for ds in datasets:
-        process_dataset(ds)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python convert.py [dataset ...] [--workers N] [--spill-pairs P]")
+    parser.add_argument("datasets", nargs="*", default=DATASETS)
+    parser.add_argument("--workers", type=int, default=len(DATASETS)) #datasets converted in parallel
+    parser.add_argument("--spill-pairs", type=int, default=SPILL_PAIRS) #(item, tid) pairs in memory before spilling
+    args = parser.parse_args()
+
+    jobs = [(ds, args.spill_pairs) for ds in args.datasets]
+    if args.workers > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(min(args.workers, len(jobs))) as pool:
+            for log in pool.imap(_process_dataset, jobs): #printed in dataset order
+                print(log)
+    else:
+        for job in jobs:
+            print(_process_dataset(job))
 
 
 '''
-conversion times:
+conversion times (one pass per dataset, sequential):
 [INFO] Processing chess.dat.gz
 ✓ Extracted to Datasets/chess_horizontal.dat
 ✓ Converted to Datasets/chess_vertical.dat
-✓ Total conversion time: 0.06 seconds
+✓ Wrote Datasets/chess.csr
+✓ Total conversion time: 0.11 seconds
 
 [INFO] Processing connect.dat.gz
 ✓ Extracted to Datasets/connect_horizontal.dat
 ✓ Converted to Datasets/connect_vertical.dat
-✓ Total conversion time: 2.06 seconds
+✓ Wrote Datasets/connect.csr
+✓ Total conversion time: 2.37 seconds
 
 [INFO] Processing mushroom.dat.gz
 ✓ Extracted to Datasets/mushroom_horizontal.dat
 ✓ Converted to Datasets/mushroom_vertical.dat
-✓ Total conversion time: 0.10 seconds
+✓ Wrote Datasets/mushroom.csr
+✓ Total conversion time: 0.12 seconds
 
 [INFO] Processing retail.dat.gz
 ✓ Extracted to Datasets/retail_horizontal.dat
 ✓ Converted to Datasets/retail_vertical.dat
-✓ Total conversion time: 0.58 seconds
-'''
\ No newline at end of file
+✓ Wrote Datasets/retail.csr
+✓ Total conversion time: 1.93 seconds
+'''
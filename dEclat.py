@@ -1,106 +1,347 @@
+import argparse
 import sys
 import os
 import time
-import tracemalloc
-from collections import defaultdict
+from encoding import load_vertical
+from parallel import mine_classes
+from sinks import OUTPUTS, ListSink, make_sink
+from rules import IndexingSink, SupportIndex, rules_path, write_rules
+from condensed import ClosedSets, MaximalSets, TopK
+from instrument import MEMORY_TRACKERS, Trace, make_tracker, trace_path
+from cache import CachingSink, ResultCache
+
+STRATEGIES = ("diffset", "hybrid")
 
 class dEclat:
-    def __init__(self, minsup):
+    def __init__(self, minsup, strategy="diffset", switch_density=0.5, workers=1, output="memory", sink=None, mode="all", min_conf=None, memory="tracemalloc", trace=False, cache=None, top_k=None):
         self.minsup = minsup #minimum support threshold
-        self.vertical_db = {} #vertical TID-lists: item -> set of transaction IDs
-        self.frequent_itemsets = [] #stores frequent itemsets and their support count
+        self.mode = mode #"all" frequent itemsets, or only "closed" / "maximal" ones
+        self.closed = None #closed itemsets found so far (mode "closed")
+        self.maximal = None #maximal itemsets found so far (mode "maximal")
+        self.output = output #where itemsets go: "memory", "text", "binary" or "count"
+        self.sink = sink #receives itemsets while mining, built from output when not given
+        self.workers = workers #processes mining top-level classes in parallel
+        self.top_items = [] #frequent 1-itemsets in the order they are popped
+        self.top_diffsets = True #representation of the top-level class
+        self.strategy = strategy #"diffset" always mines diffsets, "hybrid" keeps tidsets until a class is dense
+        self.switch_density = switch_density #class density (child support / prefix support) at which hybrid switches to diffsets
+        self.strategy_used = "" #representation the top level was mined with
+        self.vertical_db = {} #vertical TID-lists: item id -> set of transaction IDs
+        self.encoder = None #item label <-> item id dictionary
+        self.num_transactions = 0 #TIDs are encoded as 0..num_transactions-1
+        self.frequent_itemsets = [] #stores frequent itemsets and their support count (when output is "memory")
         self.stats = {} #stores performance metrics (runtime, memory)
+        self.min_conf = min_conf #confidence threshold of the rule stage, None skips it
+        self.support_index = None #itemset -> support, for the rule stage
+        self.num_rules = 0
+        self.memory = memory #memory tracking: "tracemalloc", "rss" (sampled) or "none"
+        self.trace = Trace() if trace else None #counters per recursion depth, None skips the bookkeeping
+        self.cache = cache #ResultCache answering repeated runs, None mines every time
+        self.cached = None #cached run this run was answered from
+        self.cache_input = None #file the cache entry is keyed on when the input is a converted copy of it
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top-k needs k >= 1, got {top_k}")
+        self.top_k = top_k #mine the k most frequent itemsets, minsup is only a floor and rises while mining
+        self.top = None #TopK of the itemsets found so far (with top_k)
         self.command_str = "" #command to run
 
     # Load data in vertical format
     def load_vertical_data(self, filepath):
         start_time = time.time()
-        tid_lists = defaultdict(set)
-
-        with open(filepath, 'r') as f:
-            for line in f:
-                if ':' in line:
-                    item, tids = line.strip().split(':', 1)
-                    tid_list = tids.strip().strip(',').split(',')  # Remove trailing comma and split
-                    tid_lists[item.strip()] = set(tid_list)
-
+        self.encoder, vertical_db, self.num_transactions = load_vertical(filepath)
         self.stats["load_time"] = time.time() - start_time
-        return dict(tid_lists)
+        return vertical_db
     
     # Bottom-up traversal using prefix extension and diffsets
-    def bottom_up_declat(self, prefix, items):
+    # with diffsets=False the class holds plain tidsets, which the hybrid strategy keeps until the class gets dense
+    def bottom_up_declat(self, prefix, items, diffsets=True):
         while items:
-            item, support, diffset = items.pop()
-            if support >= self.minsup:
-                new_prefix = prefix + [item]
-                self.frequent_itemsets.append((new_prefix, support)) #record as a frequent itemset
-                new_items = []
-                for other_item, _ , other_diffset in items:
+            item, support, tids = items.pop()
+            if self.trace is not None and not prefix:
+                class_start = time.perf_counter()
+                self.extend_prefix(prefix, item, support, tids, items, diffsets)
+                self.trace.span(f"class {self.encoder.decode([item])[0]}", class_start)
+            else:
+                self.extend_prefix(prefix, item, support, tids, items, diffsets)
+
+    # Record prefix+item and mine its conditional class, built from the remaining siblings
+    def extend_prefix(self, prefix, item, support, tids, siblings, diffsets):
+        if support >= self.minsup:
+            new_prefix = prefix + [item]
+            if self.top is not None:
+                self.minsup = max(self.minsup, self.top.add(new_prefix, support)) #prune below the k-th support
+            elif self.mode == "all":
+                self.sink.emit(new_prefix, support) #record as a frequent itemset
+            if self.trace is not None:
+                level_start = time.perf_counter()
+            new_items = []
+            if diffsets:
+                for other_item, _ , other_diffset in siblings:
                     # get the difference between the diffsets for the prefix and the item
-                    difference = other_diffset - diffset
+                    difference = other_diffset - tids
                     # support is difference between prefix's support and the diffset length
                     new_support = support - len(difference)
                     if new_support >= self.minsup:
                         new_items.append((other_item, new_support, difference))
-                self.bottom_up_declat(new_prefix, new_items) #recurse on new conditional class
+            else:
+                for other_item, _ , other_tidlist in siblings:
+                    intersected = tids & other_tidlist #candidate intersection
+                    if len(intersected) >= self.minsup:
+                        new_items.append((other_item, len(intersected), intersected))
+                # once the children cover most of the prefix's tids their diffsets are the smaller
+                # representation, so the whole subtree switches: d(PXY) = t(PX) - t(PXY)
+                if new_items and self.class_density(new_items, support) >= self.switch_density:
+                    new_items = [(other_item, new_support, tids - intersected) for other_item, new_support, intersected in new_items]
+                    diffsets = True
+            if self.trace is not None:
+                # the class's candidates are the itemsets one item longer than the prefix
+                self.trace.record(len(new_prefix) + 1, time.perf_counter() - level_start,
+                                  candidates=len(siblings), intersections=len(siblings),
+                                  infrequent=len(siblings) - len(new_items), frequent=len(new_items),
+                                  tidlist_size=sum(len(t) for _, _, t in new_items))
+            if self.top is not None:
+                # the most frequent extension is popped first, so the threshold rises as early as possible
+                new_items.sort(key=lambda entry: entry[1])
+
+            if self.mode == "maximal":
+                # prune the subtree when the prefix with all its frequent extensions is inside a known maximal itemset
+                # (supersets outside the subtree were visited earlier, so a leaf that is not covered is maximal)
+                if self.maximal.covers(new_prefix + [other_item for other_item, _, _ in new_items]):
+                    return
+                if not new_items:
+                    self.maximal.add(new_prefix)
+                    self.sink.emit(new_prefix, support)
+                    return
+
+            self.bottom_up_declat(new_prefix, new_items, diffsets) #recurse on new conditional class
+
+    # dCHARM: closed itemsets over tidsets or diffsets, siblings whose tidlists contain the prefix's are merged into it
+    # items are (extension, support, tids, tidsum) in ascending support order, tidsum is the sum of the
+    # itemset's TIDs (kept up to date through the diffsets) and keys the subsumption check
+    def charm_extend(self, prefix, items, diffsets):
+        removed = [False] * len(items)
+        for i, (extension, support, tids, tidsum) in enumerate(items):
+            if removed[i]:
+                continue
+            new_prefix = prefix + extension
+            new_items = []
+            for j in range(i + 1, len(items)):
+                if removed[j]:
+                    continue
+                other_extension, other_support, other_tids, _ = items[j]
+                if diffsets:
+                    child = other_tids - tids #d(PXiXj) = d(PXj) - d(PXi)
+                    new_support = support - len(child)
+                else:
+                    child = tids & other_tids #candidate intersection
+                    new_support = len(child)
+                if new_support < self.minsup:
+                    continue
+                if new_support == support:
+                    # t(Xi) ⊆ t(Xj): every transaction of Xi has Xj, so Xj joins the prefix (and every child)
+                    new_prefix = new_prefix + other_extension
+                    if new_support == other_support:
+                        removed[j] = True #equal tidlists, Xj is never closed without Xi
+                else:
+                    if new_support == other_support:
+                        removed[j] = True #t(Xj) ⊂ t(Xi), Xj is never closed without Xi
+                    new_items.append((other_extension, new_support, child))
+
+            if new_items:
+                child_diffsets = diffsets
+                if diffsets:
+                    # t(PXiXj) = t(PXi) - d(PXiXj)
+                    new_items = [(e, s, d, tidsum - sum(d)) for e, s, d in new_items]
+                elif self.strategy == "hybrid" and self.class_density(new_items, support) >= self.switch_density:
+                    new_items = [(e, s, tids - t, sum(t)) for e, s, t in new_items]
+                    child_diffsets = True
+                else:
+                    new_items = [(e, s, t, sum(t)) for e, s, t in new_items]
+                new_items.sort(key=lambda entry: entry[1])
+                self.charm_extend(new_prefix, new_items, child_diffsets)
+            if self.closed.add(new_prefix, support, tidsum):
+                self.sink.emit(new_prefix, support)
+
+    # Mine the class of the index-th popped top-level item (run in a worker process)
+    def mine_class(self, index):
+        self.sink = ListSink() #the parent emits the class's itemsets
+        position = len(self.top_items) - 1 - index
+        item, support, tids = self.top_items[position]
+        self.extend_prefix([], item, support, tids, self.top_items[:position], self.top_diffsets)
+        return self.sink.itemsets
+
+    # Average support of a class's members relative to the support of its prefix
+    def class_density(self, items, prefix_support):
+        return sum(entry[1] for entry in items) / (len(items) * prefix_support)
 
     # Count number of unique transactions (for scalability reporting)
     def estimate_num_transactions(self):
-        all_tids = set()
-        for tids in self.vertical_db.values():
-            all_tids.update(tids)
-        return len(all_tids)
+        return self.num_transactions
 
     def run(self, filepath):
-        tracemalloc.start() #start memory tracking
-        self.vertical_db = self.load_vertical_data(filepath) #load dataset
- 
-        # full possible tidlist (numbers 1 to # of horizontal db entries)
-        all_tids = set(map(str, range(1,self.estimate_num_transactions()+1)))
+        if self.mode != "all" and self.workers > 1:
+            raise ValueError("closed and maximal itemsets are mined in a single process")
+        if self.mode != "all" and self.min_conf is not None:
+            raise ValueError("rules need every frequent itemset, not only the closed or maximal ones")
+        if self.trace is not None and self.workers > 1:
+            raise ValueError("mining is traced in a single process")
+        if self.top_k is not None and (self.mode != "all" or self.workers > 1 or self.cache is not None):
+            raise ValueError("top-k itemsets are mined in a single process, without the cache")
+        memory_tracker = make_tracker(self.memory) #start memory tracking
+        memory_tracker.start()
+        if self.cache is not None:
+            self.cached = self.cache.lookup(self.cache_input or filepath, self.minsup, self.mode)
+        if self.cached is not None:
+            self.encoder, self.num_transactions = self.cached.encoder, self.cached.num_transactions
+            self.strategy_used = f"{self.strategy} (answered from cache)"
+        else:
+            self.vertical_db = self.load_vertical_data(filepath) #load dataset
+            if self.top_k is not None:
+                self.top = TopK(self.top_k)
+                self.minsup = max(self.minsup, self.top.seed(len(tids) for tids in self.vertical_db.values()))
+            items, diffsets, tidsums = self.top_level()
+
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath), self.results_header())
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        if self.min_conf is not None:
+            self.support_index = SupportIndex()
+            self.sink = IndexingSink(self.sink, self.support_index) #rules need the support of every itemset
+        if self.cache is not None and self.cached is None:
+            self.sink = CachingSink(self.sink, self.cache, self.cache_input or filepath, self.minsup, self.mode, self.num_transactions)
 
+        start_time = time.time()
+        self.sink.open(self.encoder)
+        if self.cached is not None:
+            self.cached.replay(self.sink, self.minsup) #itemsets of a cached run at this or a lower minsup
+        elif self.mode == "closed":
+            self.closed = ClosedSets()
+            self.charm_extend([], [([item], support, tids, tidsum) for (item, support, tids), tidsum in zip(items, tidsums)], diffsets)
+        elif self.workers > 1:
+            # class of the index-th popped item: its siblings are every item before it
+            self.top_items, self.top_diffsets = items, diffsets
+            estimates = [support * position for position, (_, support, _) in enumerate(items)][::-1]
+            mine_classes(self, estimates, self.workers, self.sink.emit)
+            self.top_items = []
+        elif self.top is not None:
+            self.bottom_up_declat([], items, diffsets)
+            for itemset, support in self.top.itemsets():
+                self.sink.emit(itemset, support)
+        else:
+            if self.mode == "maximal":
+                self.maximal = MaximalSets()
+            self.bottom_up_declat([], items, diffsets) #run bottom up Eclat algorithm
+        self.sink.close()
+        self.stats["mining_time"] = time.time() - start_time  #track mining runtime
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+        if self.min_conf is not None:
+            start_time = time.time()
+            self.num_rules = write_rules(self.support_index, self.min_conf, self.encoder.decode, rules_path(self.output_path(filepath)))
+            self.stats["rule_gen_time"] = time.time() - start_time
+        if self.trace is not None:
+            self.trace.export(trace_path(self.output_path(filepath)))
+
+    # Frequent items of the loaded tidlists as the top-level class: (items, whether they hold diffsets, tidsums for dCHARM)
+    def top_level(self):
         # filter 1-itemsets by min sup
             # each entry in the items list is (item, support, diffset)
             # support is length of the tidlist
             # diffset is set difference between all tids and the item's tidlist (total tids - item tidlist)
-        items = [(item, len(tids), (all_tids - tids)) for item, tids in self.vertical_db.items() if len(tids) >= self.minsup]
+        items = [(item, len(tids), tids) for item, tids in self.vertical_db.items() if len(tids) >= self.minsup]
+        items.sort() #item ids follow ascending support
+        self.vertical_db = {item: tids for item, _, tids in items} #keep only the frequent tidlists
 
-        start_time = time.time()
-        self.bottom_up_declat([], items) #run bottom up Eclat algorithm
-        self.stats["mining_time"] = time.time() - start_time  #track mining runtime
-        self.stats["peak_memory_MB"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
-        tracemalloc.stop()
+        # the top level is a class whose prefix (the empty set) is in every transaction
+        diffsets = self.strategy == "diffset" or (len(items) > 0 and self.class_density(items, self.num_transactions) >= self.switch_density)
+        tidsums = [sum(tids) for _, _, tids in items] if self.mode == "closed" else None
+        if diffsets:
+            # full possible tidlist (dense TIDs 0 to # of horizontal db entries - 1)
+            all_tids = set(range(self.num_transactions))
+            items = [(item, support, (all_tids - tids)) for item, support, tids in items]
+        self.strategy_used = f"{self.strategy} ({'diffsets' if diffsets else 'tidsets'} at top level)"
+        return items, diffsets, tidsums
 
-    def print_results(self, input_path):
+    def output_path(self, input_path):
         dataset_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = f"Results/{dataset_name}_declat_{self.minsup}_output.txt"
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if self.top_k is not None:
+            return f"Results/{dataset_name}_declat_top{self.top_k}_output.txt" #minsup is only known after mining
+        mode = "" if self.mode == "all" else f"_{self.mode}"
+        return f"Results/{dataset_name}_declat{mode}_{self.minsup}_output.txt"
+
+    def results_header(self):
+        return f"== Command ==\n{self.command_str}\n\n"
 
-        with open(output_path, "w") as f:
-            f.write(f"== Command ==\n{self.command_str}\n\n")
+    def print_results(self, input_path):
+        output_path = self.output_path(input_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            f.write("== Frequent Itemsets ==\n")
-            for itemset, support in self.frequent_itemsets:
-                f.write(f"{' '.join(itemset)} ({support})\n")
+        # a text sink already streamed the header and itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write(self.results_header())
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
 
             f.write("\n== Execution Statistics ==\n")
             f.write(f"Transactions: {self.estimate_num_transactions()}\n")
             f.write(f"Min Support: {self.minsup}\n")
+            f.write(f"Strategy: {self.strategy_used}\n")
+            f.write(f"Workers: {self.workers}\n")
+            f.write(f"Itemsets: {self.mode if self.top_k is None else f'top {self.top_k} (minsup raised to {self.minsup})'}\n")
+            f.write(f"Memory Tracking: {self.memory}\n")
+            if self.cached is not None:
+                f.write(f"Answered From Cache: {self.cached.path} (minsup {self.cached.minsup})\n")
+            if self.min_conf is not None:
+                f.write(f"Rules: {self.num_rules} at min confidence {self.min_conf}, written to {rules_path(output_path)}\n")
             for k, v in self.stats.items():
                 label = k.replace("_", " ").title()
-                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n")
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n" if k.endswith("MB") else f"{label}: {v}\n")
+            if self.trace is not None:
+                self.trace.write_levels(f)
+                f.write(f"Trace written to: {trace_path(output_path)}\n")
 
         print(f"Results written to: {output_path}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python dEclat.py <vertical_data_file> <minsup>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python dEclat.py <vertical_data_file> <minsup> | --top-k K [--strategy diffset|hybrid] [--switch-density D] [--workers N] [--output text|binary|count] [--closed|--maximal] [--min-conf C] [--memory tracemalloc|rss|none] [--trace] [--cache]")
+    parser.add_argument("filepath")
+    parser.add_argument("minsup", type=int, nargs="?") #with --top-k, a floor for the raised threshold (default 1)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="diffset")
+    parser.add_argument("--switch-density", type=float, default=0.5) #hybrid: switch a class to diffsets at this density
+    parser.add_argument("--workers", type=int, default=1) #processes mining top-level classes in parallel
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--min-conf", type=float) #also generate association rules at this confidence
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc") #rss samples the process instead of tracing allocations
+    parser.add_argument("--trace", action="store_true") #count differences per depth and export a trace
+    parser.add_argument("--cache", action="store_true") #answer from and add to the result cache
+    parser.add_argument("--top-k", type=int) #mine the K most frequent itemsets (and those tied with the K-th)
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--closed", action="store_const", const="closed", dest="mode", default="all") #dCHARM
+    modes.add_argument("--maximal", action="store_const", const="maximal", dest="mode") #MaxEclat over diffsets
+    args = parser.parse_args()
+    if args.workers > 1 and args.mode != "all":
+        parser.error("--workers cannot be combined with --closed or --maximal")
+    if args.min_conf is not None and args.mode != "all":
+        parser.error("--min-conf cannot be combined with --closed or --maximal")
+    if args.trace and args.workers > 1:
+        parser.error("--trace cannot be combined with --workers")
+    if args.minsup is None and args.top_k is None:
+        parser.error("minsup is required without --top-k")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.top_k is not None and (args.workers > 1 or args.mode != "all" or args.cache):
+        parser.error("--top-k cannot be combined with --workers, --closed, --maximal or --cache")
 
-    filepath = sys.argv[1]
-    minsup = int(sys.argv[2])
+    filepath = args.filepath
+    minsup = args.minsup if args.minsup is not None else 1
 
-    declat = dEclat(minsup)
+    declat = dEclat(minsup, strategy=args.strategy, switch_density=args.switch_density, workers=args.workers, output=args.output, mode=args.mode, min_conf=args.min_conf, memory=args.memory, trace=args.trace, cache=ResultCache() if args.cache else None, top_k=args.top_k)
     declat.command_str = f"python {' '.join(sys.argv)}"  #store command line
     declat.run(filepath)
     declat.print_results(filepath)
\ No newline at end of file
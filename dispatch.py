@@ -0,0 +1,167 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from encoding import BINARY_SUFFIX, BinaryDataset, is_binary, load_horizontal, load_vertical, write_binary
+from sinks import OUTPUTS
+from tidlists import AUTO_BITSET_DENSITY
+from instrument import MEMORY_TRACKERS
+from cache import ResultCache
+from apriori import Apriori
+from eclat import Eclat
+from dEclat import dEclat
+from fpgrowth import FPGrowth
+
+# One entry point for every miner: mine(path, minsup) detects the input layout, gathers cheap dataset statistics
+# in a single pass and picks the miner predicted to be fastest
+# on this code base (all miners reading the same .csr file) FP-Growth wins on sparse data and on mushroom
+# (retail at 100: 2.1 s against 16.7 s for Eclat, mushroom at 400: 6.0 s against 23.0 s), Eclat over bitsets
+# wins on chess (1900: 1.4 s against 2.4 s); the line between them is the density of the database
+# (average transaction length / items), 0.19 on mushroom and 0.49 on chess
+
+ALGORITHMS = ("auto", "apriori", "eclat", "declat", "fpgrowth")
+
+# Input layouts each miner reads, any other input is converted to a temporary binary dataset first
+LAYOUTS = {"apriori": ("horizontal", "binary"), "fpgrowth": ("horizontal", "binary"),
+           "eclat": ("vertical", "binary"), "declat": ("vertical", "binary")}
+
+# at or above this database density Eclat (bitsets) beats FP-Growth
+ECLAT_DENSITY = 0.3
+
+# Layout of a dataset file: "binary" (.csr), "vertical" (lines like "item: tid1,tid2,..") or "horizontal"
+def detect_format(filepath):
+    if is_binary(filepath):
+        return "binary"
+    with open(filepath, "r") as f:
+        for line in f:
+            if line.strip():
+                return "vertical" if ":" in line else "horizontal"
+    return "horizontal"
+
+# Transaction count and item supports in one pass over the file
+def item_supports(filepath, fmt):
+    if fmt == "binary":
+        data = BinaryDataset(filepath)
+        return data.num_transactions, [data.support(item_id) for item_id in range(data.num_items)]
+    supports = Counter()
+    num_transactions = 0
+    with open(filepath, "r") as f:
+        if fmt == "horizontal":
+            for line in f:
+                supports.update(set(line.split())) #an item repeated on a line counts once
+                num_transactions += 1
+        else:
+            # TIDs of a vertical file run from 0, the largest one gives the transaction count
+            for line in f:
+                if ':' in line:
+                    item, tids = line.split(':', 1)
+                    tids = tids.strip().strip(',').split(',')
+                    supports[item.strip()] = len(tids)
+                    num_transactions = max(num_transactions, max(map(int, tids)) + 1)
+    return num_transactions, list(supports.values())
+
+# Statistics the choice is made on, supports are relative to the number of transactions
+def dataset_stats(filepath, minsup, fmt=None):
+    fmt = fmt or detect_format(filepath)
+    num_transactions, supports = item_supports(filepath, fmt)
+    frequent = [support for support in supports if support >= minsup]
+    n = max(1, num_transactions)
+    avg_length = sum(supports) / n
+    return {
+        "format": fmt,
+        "transactions": num_transactions,
+        "items": len(supports),
+        "avg_transaction_length": round(avg_length, 2),
+        "density": round(avg_length / max(1, len(supports)), 4),
+        "frequent_items": len(frequent),
+        "frequent_density": round(sum(frequent) / (len(frequent) * n), 4) if frequent else 0.0, #as tidlists.density
+        "max_item_support": round(max(supports, default=0) / n, 4),
+        "median_item_support": round(statistics.median(supports) / n, 4) if supports else 0.0,
+    }
+
+# Miner and options predicted to be fastest for the statistics, with the reason
+def choose(stats):
+    if stats["density"] >= ECLAT_DENSITY:
+        backend = "bitset" if stats["frequent_density"] >= AUTO_BITSET_DENSITY else "set"
+        return "eclat", {"backend": backend}, f"dense database (density {stats['density']} >= {ECLAT_DENSITY}), Eclat over {backend}s"
+    return "fpgrowth", {}, f"sparse database (density {stats['density']} < {ECLAT_DENSITY}), FP-Growth"
+
+# Write filepath (horizontal or vertical) as a binary dataset in directory, named after the dataset so the
+# miner's results file keeps the dataset's name
+def to_binary(filepath, fmt, directory):
+    path = os.path.join(directory, os.path.splitext(os.path.basename(filepath))[0] + BINARY_SUFFIX)
+    if fmt == "horizontal":
+        encoder, transactions = load_horizontal(filepath)
+    else:
+        encoder, tid_lists, num_transactions = load_vertical(filepath)
+        rows = [[] for _ in range(num_transactions)]
+        for item in sorted(tid_lists):
+            for tid in tid_lists[item]:
+                rows[tid].append(item)
+        transactions = rows
+    write_binary(path, encoder, transactions)
+    return path
+
+# Mine filepath at minsup with algorithm ("auto" picks one), options go to the miner's constructor
+# returns the miner after its run, miner.dispatch records the choice and the dataset statistics, which also go
+# into miner.stats (dispatch_* and dataset_* keys) and so into the results file
+# command is the command line the vertical miners write at the top of their results
+def mine(filepath, minsup, algorithm="auto", command="", **options):
+    start_time = time.time()
+    stats = dataset_stats(filepath, minsup)
+    if algorithm == "auto":
+        algorithm, chosen, reason = choose(stats)
+        options = {**chosen, **options}
+    else:
+        reason = "requested"
+    dispatch_time = time.time() - start_time
+
+    if algorithm == "apriori":
+        miner = Apriori(minsup, **options)
+    elif algorithm == "eclat":
+        miner = Eclat(**options)
+    elif algorithm == "declat":
+        miner = dEclat(minsup, **options)
+    else:
+        miner = FPGrowth(minsup, **options)
+    miner.dispatch = {"algorithm": algorithm, "options": options, "reason": reason, "statistics": stats}
+    if hasattr(miner, "command_str"):
+        miner.command_str = command
+    miner.cache_input = filepath #cache entries are keyed on the user's file, not on a converted copy
+
+    # a cached run is answered without reading the input, so the input is only converted on a miss
+    convert = stats["format"] not in LAYOUTS[algorithm]
+    cache = options.get("cache")
+    if convert and cache is not None and cache.lookup(filepath, minsup, options.get("mode", "all")) is not None:
+        convert = False
+    with tempfile.TemporaryDirectory(prefix="dispatch_") as directory:
+        path = to_binary(filepath, stats["format"], directory) if convert else filepath
+        if algorithm == "eclat":
+            miner.run(path, minsup)
+        else:
+            miner.run(path)
+    miner.stats["dispatch_time"] = dispatch_time
+    miner.stats["dispatch_algorithm"] = algorithm
+    miner.stats["dispatch_reason"] = reason
+    miner.stats.update((f"dataset_{k}", v) for k, v in stats.items())
+    return miner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python dispatch.py <data_file> <minsup> [--algorithm auto|apriori|eclat|declat|fpgrowth] [--output text|binary|count] [--min-conf C] [--memory tracemalloc|rss|none] [--cache]")
+    parser.add_argument("filepath") #horizontal, vertical or binary dataset
+    parser.add_argument("minsup", type=int)
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="auto")
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--min-conf", type=float) #also generate association rules at this confidence
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc")
+    parser.add_argument("--cache", action="store_true") #answer from and add to the result cache
+    args = parser.parse_args()
+
+    miner = mine(args.filepath, args.minsup, args.algorithm, command=f"python {' '.join(sys.argv)}", output=args.output,
+                 min_conf=args.min_conf, memory=args.memory, cache=ResultCache() if args.cache else None)
+    miner.print_results(args.filepath)
+    print(f"Mined with {miner.dispatch['algorithm']}: {miner.dispatch['reason']}")
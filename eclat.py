@@ -1,102 +1,371 @@
+import argparse
 import sys
 import os
+import pickle
+import shutil
+import tempfile
 import time
-import tracemalloc
-from collections import defaultdict
+from encoding import load_vertical
+from tidlists import BACKENDS, make_backend
+from parallel import mine_classes
+from sinks import OUTPUTS, ListSink, make_sink
+from rules import IndexingSink, SupportIndex, rules_path, write_rules
+from condensed import ClosedSets, MaximalSets, TopK
+from instrument import MEMORY_TRACKERS, Trace, make_tracker, trace_path
+from cache import CachingSink, ResultCache
 
 class Eclat:
-    def __init__(self):
+    def __init__(self, backend="auto", workers=1, output="memory", sink=None, mode="all", min_conf=None, memory="tracemalloc", trace=False, cache=None, mem_budget=None, top_k=None):
         self.minsup = 0 #frequency × transactions
-        self.vertical_db = {} #Item → set of TIDs (vertical format)
-        self.frequent_itemsets = [] #list of freqItemsets
+        self.mode = mode #"all" frequent itemsets, or only "closed" / "maximal" ones
+        self.closed = None #closed itemsets found so far (mode "closed")
+        self.maximal = None #maximal itemsets found so far (mode "maximal")
+        self.output = output #where itemsets go: "memory", "text", "binary" or "count"
+        self.sink = sink #receives itemsets while mining, built from output when not given
+        self.workers = workers #processes mining top-level classes in parallel
+        self.top_items = [] #frequent 1-itemsets in the order they are popped
+        self.backend = backend #tidlist representation: "set", "bitset" or "auto"
+        self.tidlists = None #backend chosen for this run
+        self.vertical_db = {} #Item id → set of TIDs (vertical format)
+        self.encoder = None #item label <-> item id dictionary
+        self.num_transactions = 0 #TIDs are encoded as 0..num_transactions-1
+        self.frequent_itemsets = [] #list of freqItemsets (kept when output is "memory")
         self.stats = {} #timing and memory info
+        self.min_conf = min_conf #confidence threshold of the rule stage, None skips it
+        self.support_index = None #itemset -> support, for the rule stage
+        self.num_rules = 0
+        self.memory = memory #memory tracking: "tracemalloc", "rss" (sampled) or "none"
+        self.trace = Trace() if trace else None #counters per recursion depth, None skips the bookkeeping
+        self.cache = cache #ResultCache answering repeated runs, None mines every time
+        self.cached = None #cached run this run was answered from
+        self.cache_input = None #file the cache entry is keyed on when the input is a converted copy of it
+        self.mem_budget = mem_budget #MB of tidlists held by pending classes before new classes are spilled, None never spills
+        self.live_bytes = 0 #bytes of the tidlists of pending classes (mode "all" with a budget)
+        self.peak_bytes = 0
+        self.spill_dir = None #temporary directory of the spilled classes
+        self.spilled = [] #files of the spilled classes still to mine
+        self.num_spilled = 0
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top-k needs k >= 1, got {top_k}")
+        self.top_k = top_k #mine the k most frequent itemsets, minsup is only a floor and rises while mining
+        self.top = None #TopK of the itemsets found so far (with top_k)
         self.command_str = "" #command to run 
 
     # Load data in vertical format
     def load_vertical_data(self, filepath):
         start_time = time.time()
-        tid_lists = defaultdict(set)
-
-        with open(filepath, 'r') as f:
-            for line in f:
-                if ':' in line:
-                    item, tids = line.strip().split(':', 1)
-                    tid_list = tids.strip().strip(',').split(',')
-                    tid_lists[item.strip()] = set(tid_list)
-
+        self.encoder, vertical_db, self.num_transactions = load_vertical(filepath)
         self.stats["load_time"] = time.time() - start_time
-        return dict(tid_lists)
+        return vertical_db
 
     # Bottom-up traversal using prefix extension and tid-list intersections
+    # the popped entry is only referenced by extend_prefix, so its tidlist is freed once the class is built
     def bottom_up_eclat(self, prefix, items):
         while items:
-            item, tidlist = items.pop()
-            support = len(tidlist)
-            if support >= self.minsup:
-                new_prefix = prefix + [item]
-                self.frequent_itemsets.append((new_prefix, support)) #record as a frequent itemset
+            item = items[-1][0]
+            if self.mem_budget is not None:
+                self.live_bytes -= sys.getsizeof(items[-1][1])
+            if self.trace is not None and not prefix:
+                class_start = time.perf_counter()
+                self.extend_prefix(prefix, *items.pop(), items)
+                self.trace.span(f"class {self.encoder.decode([item])[0]}", class_start)
+            else:
+                self.extend_prefix(prefix, *items.pop(), items)
 
-                new_items = []
-                for other_item, other_tidlist in items:
-                    intersected = tidlist & other_tidlist #candidate intersection
-                    if len(intersected) >= self.minsup:
-                        new_items.append((other_item, intersected))
+    # Record prefix+item and mine its conditional class, built from the remaining siblings
+    def extend_prefix(self, prefix, item, tidlist, siblings):
+        support = self.tidlists.support(tidlist)
+        if support >= self.minsup:
+            new_prefix = prefix + [item]
+            if self.top is not None:
+                self.minsup = max(self.minsup, self.top.add(new_prefix, support)) #prune below the k-th support
+            elif self.mode == "all":
+                self.sink.emit(new_prefix, support) #record as a frequent itemset
 
-                self.bottom_up_eclat(new_prefix, new_items) #recurse on new conditional class
+            if self.trace is not None:
+                level_start = time.perf_counter()
+            new_items = []
+            for other_item, other_tidlist in siblings:
+                intersected = tidlist & other_tidlist #candidate intersection
+                if self.tidlists.support(intersected) >= self.minsup:
+                    new_items.append((other_item, intersected))
+            if self.trace is not None:
+                # the class's candidates are the itemsets one item longer than the prefix
+                self.trace.record(len(new_prefix) + 1, time.perf_counter() - level_start,
+                                  candidates=len(siblings), intersections=len(siblings),
+                                  infrequent=len(siblings) - len(new_items), frequent=len(new_items),
+                                  tidlist_size=sum(self.tidlists.support(t) for _, t in new_items))
+            del tidlist #consumed, the subtree only needs the extensions' tidlists
+            if self.top is not None:
+                # the most frequent extension is popped first, so the threshold rises as early as possible
+                new_items.sort(key=lambda entry: self.tidlists.support(entry[1]))
 
-    def run(self, filepath, minsup):
-        tracemalloc.start()
-        self.vertical_db = self.load_vertical_data(filepath)
+            if self.mode == "maximal":
+                # prune the subtree when the prefix with all its frequent extensions is inside a known maximal itemset
+                # (supersets outside the subtree were visited earlier, so a leaf that is not covered is maximal)
+                if self.maximal.covers(new_prefix + [other_item for other_item, _ in new_items]):
+                    return
+                if not new_items:
+                    self.maximal.add(new_prefix)
+                    self.sink.emit(new_prefix, support)
+                    return
+
+            if self.mem_budget is not None and not self.admit(new_prefix, new_items):
+                return #spilled, mined after the rest of the lattice
+            self.bottom_up_eclat(new_prefix, new_items) #recurse on new conditional class
+
+    # Memory budget: count a new class's tidlists as pending when they fit in the budget, otherwise write the class
+    # to a spill file and return False; tidlists are measured by their container size (sys.getsizeof), the TID
+    # objects of set tidlists are shared with the loaded database
+    def admit(self, prefix, items):
+        class_bytes = sum(sys.getsizeof(tidlist) for _, tidlist in items)
+        if items and self.live_bytes + class_bytes > self.mem_budget * 1024 * 1024:
+            path = os.path.join(self.spill_dir, f"class_{self.num_spilled}.pkl")
+            with open(path, "wb") as f:
+                pickle.dump((prefix, items), f, pickle.HIGHEST_PROTOCOL)
+            self.spilled.append(path)
+            self.num_spilled += 1
+            return False
+        self.pend(items, class_bytes)
+        return True
+
+    # Count a class as pending, its extensions in ascending support order as at the top level
+    # (the most frequent one is popped first, with the rarer ones as its siblings)
+    def pend(self, items, class_bytes):
+        items.sort(key=lambda entry: self.tidlists.support(entry[1]))
+        self.live_bytes += class_bytes
+        self.peak_bytes = max(self.peak_bytes, self.live_bytes)
+
+    # Memory budget: mine the top-level classes, then the spilled classes one at a time
+    # a reloaded class is always mined (its own subclasses spill again when they do not fit)
+    def budgeted_eclat(self, items):
+        self.spill_dir = tempfile.mkdtemp(prefix="eclat_spill_")
+        try:
+            self.live_bytes = self.peak_bytes = 0
+            self.pend(items, sum(sys.getsizeof(tidlist) for _, tidlist in items))
+            self.bottom_up_eclat([], items)
+            while self.spilled:
+                path = self.spilled.pop() #most recent first, the lattice is still walked depth first
+                with open(path, "rb") as f:
+                    prefix, items = pickle.load(f)
+                os.remove(path)
+                self.pend(items, sum(sys.getsizeof(tidlist) for _, tidlist in items))
+                self.bottom_up_eclat(prefix, items)
+        finally:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spilled = []
+
+    # CHARM: closed itemsets, siblings whose tidlists contain the prefix's are merged into it instead of explored
+    # items are (extension, support, tidlist) in ascending support order
+    def charm_extend(self, prefix, items):
+        removed = [False] * len(items)
+        for i, (extension, support, tidlist) in enumerate(items):
+            if removed[i]:
+                continue
+            new_prefix = prefix + extension
+            new_items = []
+            for j in range(i + 1, len(items)):
+                if removed[j]:
+                    continue
+                other_extension, other_support, other_tidlist = items[j]
+                intersected = tidlist & other_tidlist #candidate intersection
+                new_support = self.tidlists.support(intersected)
+                if new_support < self.minsup:
+                    continue
+                if new_support == support:
+                    # t(Xi) ⊆ t(Xj): every transaction of Xi has Xj, so Xj joins the prefix (and every child)
+                    new_prefix = new_prefix + other_extension
+                    if new_support == other_support:
+                        removed[j] = True #equal tidlists, Xj is never closed without Xi
+                else:
+                    if new_support == other_support:
+                        removed[j] = True #t(Xj) ⊂ t(Xi), Xj is never closed without Xi
+                    new_items.append((other_extension, new_support, intersected))
+
+            if new_items:
+                new_items.sort(key=lambda entry: entry[1])
+                self.charm_extend(new_prefix, new_items)
+            if self.closed.add(new_prefix, support, self.tidlists.key(tidlist)):
+                self.sink.emit(new_prefix, support)
+
+    # Mine the class of the index-th popped top-level item (run in a worker process)
+    def mine_class(self, index):
+        self.sink = ListSink() #the parent emits the class's itemsets
+        position = len(self.top_items) - 1 - index
+        item, tidlist = self.top_items[position]
+        self.extend_prefix([], item, tidlist, self.top_items[:position])
+        return self.sink.itemsets
 
+    def run(self, filepath, minsup):
+        if self.mode != "all" and self.workers > 1:
+            raise ValueError("closed and maximal itemsets are mined in a single process")
+        if self.mode != "all" and self.min_conf is not None:
+            raise ValueError("rules need every frequent itemset, not only the closed or maximal ones")
+        if self.trace is not None and self.workers > 1:
+            raise ValueError("mining is traced in a single process")
+        if self.mem_budget is not None and (self.mode != "all" or self.workers > 1):
+            raise ValueError("a memory budget applies to all frequent itemsets mined in a single process")
+        if self.top_k is not None and (self.mode != "all" or self.workers > 1 or self.cache is not None or self.mem_budget is not None):
+            raise ValueError("top-k itemsets are mined in a single process, without the cache or a memory budget")
+        memory_tracker = make_tracker(self.memory) #start memory tracking
+        memory_tracker.start()
         self.minsup = minsup
+        if self.cache is not None:
+            self.cached = self.cache.lookup(self.cache_input or filepath, self.minsup, self.mode)
+        if self.cached is not None:
+            self.encoder, self.num_transactions = self.cached.encoder, self.cached.num_transactions
+        else:
+            self.vertical_db = self.load_vertical_data(filepath)
+            if self.top_k is not None:
+                self.top = TopK(self.top_k)
+                self.minsup = max(self.minsup, self.top.seed(len(tids) for tids in self.vertical_db.values()))
+            items = self.top_level()
 
-         #filter 1-itemsets by minsup
-        items = [(item, tids) for item, tids in self.vertical_db.items() if len(tids) >= self.minsup]
-        items.sort()
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath), self.results_header())
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        if self.min_conf is not None:
+            self.support_index = SupportIndex()
+            self.sink = IndexingSink(self.sink, self.support_index) #rules need the support of every itemset
+        if self.cache is not None and self.cached is None:
+            self.sink = CachingSink(self.sink, self.cache, self.cache_input or filepath, self.minsup, self.mode, self.num_transactions)
 
         start_time = time.time()
-        self.bottom_up_eclat([], items) #run bottom up Eclat algorithm
+        self.sink.open(self.encoder)
+        if self.cached is not None:
+            self.cached.replay(self.sink, self.minsup) #itemsets of a cached run at this or a lower minsup
+        elif self.mode == "closed":
+            self.closed = ClosedSets()
+            self.charm_extend([], [([item], self.tidlists.support(tidlist), tidlist) for item, tidlist in items])
+        elif self.workers > 1:
+            # class of the index-th popped item: its siblings are every item before it
+            self.top_items = items
+            estimates = [self.tidlists.support(tidlist) * position for position, (_, tidlist) in enumerate(items)][::-1]
+            mine_classes(self, estimates, self.workers, self.sink.emit)
+            self.top_items = []
+        elif self.mem_budget is not None:
+            self.budgeted_eclat(items)
+        elif self.top is not None:
+            self.bottom_up_eclat([], items)
+            for itemset, support in self.top.itemsets():
+                self.sink.emit(itemset, support)
+        else:
+            if self.mode == "maximal":
+                self.maximal = MaximalSets()
+            self.bottom_up_eclat([], items) #run bottom up Eclat algorithm
+        self.sink.close()
         self.stats["mining_time"] = time.time() - start_time #track mining runtime
-        self.stats["peak_memory_MB"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
-        tracemalloc.stop()
+        if self.mem_budget is not None and self.cached is None:
+            self.stats["peak_tidlist_MB"] = round(self.peak_bytes / (1024 * 1024), 2)
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
 
-    def print_results(self, input_path):
+        if self.min_conf is not None:
+            start_time = time.time()
+            self.num_rules = write_rules(self.support_index, self.min_conf, self.encoder.decode, rules_path(self.output_path(filepath)))
+            self.stats["rule_gen_time"] = time.time() - start_time
+        if self.trace is not None:
+            self.trace.export(trace_path(self.output_path(filepath)))
+
+    # Frequent items of the loaded tidlists, converted to the backend picked for them
+    def top_level(self):
+        self.tidlists = make_backend(self.backend, self.vertical_db.values(), self.minsup, self.num_transactions)
+
+         #filter 1-itemsets by minsup
+        items = [(item, self.tidlists.convert(tids)) for item, tids in self.vertical_db.items() if len(tids) >= self.minsup]
+        items.sort() #item ids follow ascending support
+        # keep only the frequent tidlists, in the backend's representation (none under a memory budget, so popped
+        # top-level tidlists are freed)
+        self.vertical_db = {} if self.mem_budget is not None else dict(items)
+        return items
+
+    def output_path(self, input_path):
         dataset_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = f"Results/{dataset_name}_eclat_{self.minsup}_output.txt"
+        if self.top_k is not None:
+            return f"Results/{dataset_name}_eclat_top{self.top_k}_output.txt" #minsup is only known after mining
+        mode = "" if self.mode == "all" else f"_{self.mode}"
+        return f"Results/{dataset_name}_eclat{mode}_{self.minsup}_output.txt"
+
+    def results_header(self):
+        return f"== Command ==\n{self.command_str}\n\n"
+
+    def print_results(self, input_path):
+        output_path = self.output_path(input_path)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        with open(output_path, "w") as f:
-            f.write(f"== Command ==\n{self.command_str}\n\n")
-            
-            f.write("== Frequent Itemsets ==\n")
-            for itemset, support in self.frequent_itemsets:
-                f.write(f"{' '.join(itemset)} ({support})\n")
+        # a text sink already streamed the header and itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write(self.results_header())
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
 
             f.write("\n== Execution Statistics ==\n")
             f.write(f"Transactions: {self.estimate_num_transactions()}\n")
             f.write(f"Minimum Frequency: {self.minsup} \n")
+            if self.cached is not None:
+                f.write(f"Answered From Cache: {self.cached.path} (minsup {self.cached.minsup})\n")
+            else:
+                f.write(f"Tidlist Backend: {self.tidlists.name}\n")
+            f.write(f"Workers: {self.workers}\n")
+            f.write(f"Itemsets: {self.mode if self.top_k is None else f'top {self.top_k} (minsup raised to {self.minsup})'}\n")
+            f.write(f"Memory Tracking: {self.memory}\n")
+            if self.mem_budget is not None and self.cached is None:
+                f.write(f"Memory Budget: {self.mem_budget} MB, {self.num_spilled} classes spilled to disk\n")
+            if self.min_conf is not None:
+                f.write(f"Rules: {self.num_rules} at min confidence {self.min_conf}, written to {rules_path(output_path)}\n")
             for k, v in self.stats.items():
                 label = k.replace("_", " ").title()
-                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n")
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n" if k.endswith("MB") else f"{label}: {v}\n")
+            if self.trace is not None:
+                self.trace.write_levels(f)
+                f.write(f"Trace written to: {trace_path(output_path)}\n")
 
         print(f"Results written to: {output_path}")
 
     # Count number of unique transactions (for scalability reporting)
     def estimate_num_transactions(self):
-        all_tids = set()
-        for tids in self.vertical_db.values():
-            all_tids.update(tids)
-        return len(all_tids)
+        return self.num_transactions
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python eclat.py <vertical_data_file> <minsup>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python eclat.py <vertical_data_file> <minsup> | --top-k K [--backend set|bitset|auto] [--workers N] [--output text|binary|count] [--closed|--maximal] [--min-conf C] [--memory tracemalloc|rss|none] [--trace] [--cache] [--mem-budget MB]")
+    parser.add_argument("filepath")
+    parser.add_argument("minsup", type=int, nargs="?") #with --top-k, a floor for the raised threshold (default 1)
+    parser.add_argument("--backend", choices=BACKENDS, default="auto") #auto picks bitsets on dense data
+    parser.add_argument("--workers", type=int, default=1) #processes mining top-level classes in parallel
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--min-conf", type=float) #also generate association rules at this confidence
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc") #rss samples the process instead of tracing allocations
+    parser.add_argument("--trace", action="store_true") #count intersections per depth and export a trace
+    parser.add_argument("--cache", action="store_true") #answer from and add to the result cache
+    parser.add_argument("--mem-budget", type=float) #MB of pending tidlists, classes beyond it are spilled to disk
+    parser.add_argument("--top-k", type=int) #mine the K most frequent itemsets (and those tied with the K-th)
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--closed", action="store_const", const="closed", dest="mode", default="all") #CHARM
+    modes.add_argument("--maximal", action="store_const", const="maximal", dest="mode") #MaxEclat
+    args = parser.parse_args()
+    if args.workers > 1 and args.mode != "all":
+        parser.error("--workers cannot be combined with --closed or --maximal")
+    if args.min_conf is not None and args.mode != "all":
+        parser.error("--min-conf cannot be combined with --closed or --maximal")
+    if args.trace and args.workers > 1:
+        parser.error("--trace cannot be combined with --workers")
+    if args.mem_budget is not None and (args.workers > 1 or args.mode != "all"):
+        parser.error("--mem-budget cannot be combined with --workers, --closed or --maximal")
+    if args.minsup is None and args.top_k is None:
+        parser.error("minsup is required without --top-k")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.top_k is not None and (args.workers > 1 or args.mode != "all" or args.cache or args.mem_budget is not None):
+        parser.error("--top-k cannot be combined with --workers, --closed, --maximal, --cache or --mem-budget")
 
-    filepath = sys.argv[1]
-    minsup = int(sys.argv[2])        
+    filepath = args.filepath
+    minsup = args.minsup if args.minsup is not None else 1
 
-    eclat = Eclat()
+    eclat = Eclat(backend=args.backend, workers=args.workers, output=args.output, mode=args.mode, min_conf=args.min_conf, memory=args.memory, trace=args.trace, cache=ResultCache() if args.cache else None, mem_budget=args.mem_budget, top_k=args.top_k)
     eclat.command_str = f"python {' '.join(sys.argv)}"  #store command line 
     eclat.run(filepath, minsup)
     eclat.print_results(filepath)
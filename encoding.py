@@ -0,0 +1,164 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+
+# Binary dataset format written by convert.py (suffix BINARY_SUFFIX), read through mmap without parsing
+#   header: b"AACS", version, number of transactions N, number of items M, number of (tid, item) pairs P, label bytes
+#           (uint32 each, little endian)
+#   then uint32 arrays: transaction offsets (N+1), transaction item ids (P), tidlist offsets (M+1), tidlist TIDs (P),
+#   label offsets (M+1), followed by the utf-8 labels
+# transaction i is items[offsets[i]:offsets[i+1]] in ascending id order, and the tidlist of item id j is
+# tids[tid_offsets[j]:tid_offsets[j+1]] in ascending TID order (CSR layout); label j is the label of item id j,
+# writers here assign ids in ItemEncoder's support order but readers take the stored order as it is
+BINARY_SUFFIX = ".csr"
+BINARY_MAGIC = b"AACS"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4s5I")
+
+# Dense integer dictionary for item labels
+# ids are assigned by ascending support (ties broken by label), so id order is support order
+class ItemEncoder:
+    def __init__(self, supports):
+        self.labels = sorted(supports, key=lambda label: (supports[label], label)) #item id -> label
+        self.ids = {label: item_id for item_id, label in enumerate(self.labels)} #label -> item id
+
+    # Encoder whose item ids are the positions of labels (e.g. read back from a file)
+    @classmethod
+    def from_labels(cls, labels):
+        return cls({label: item_id for item_id, label in enumerate(labels)})
+
+    def encode(self, label):
+        return self.ids[label]
+
+    # Map an itemset of ids back to the original labels
+    def decode(self, itemset):
+        return [self.labels[item_id] for item_id in itemset]
+
+def is_binary(filepath):
+    return filepath.endswith(BINARY_SUFFIX)
+
+# Write transactions (sorted tuples of item ids from encoder) in the binary format
+def write_binary(filepath, encoder, transactions):
+    num_items = len(encoder.labels)
+    txn_offsets = array('I', [0])
+    txn_items = array('I')
+    tid_lists = [array('I') for _ in range(num_items)]
+    for tid, transaction in enumerate(transactions):
+        txn_items.extend(transaction)
+        txn_offsets.append(len(txn_items))
+        for item_id in transaction:
+            tid_lists[item_id].append(tid)
+
+    tid_offsets = array('I', [0])
+    tids = array('I')
+    for tid_list in tid_lists:
+        tids.extend(tid_list)
+        tid_offsets.append(len(tids))
+
+    labels = [label.encode("utf-8") for label in encoder.labels]
+    label_offsets = array('I', [0])
+    for label in labels:
+        label_offsets.append(label_offsets[-1] + len(label))
+
+    with open(filepath, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(txn_offsets) - 1, num_items, len(txn_items), label_offsets[-1]))
+        for values in (txn_offsets, txn_items, tid_offsets, tids, label_offsets):
+            if sys.byteorder == "big":
+                values.byteswap()
+            values.tofile(f)
+        f.write(b"".join(labels))
+
+# A binary dataset mapped into memory, the arrays are memoryviews over the file's pages
+# (nothing is parsed or copied, and processes mapping the same file share the pages)
+class BinaryDataset:
+    def __init__(self, filepath):
+        with open(filepath, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_transactions, self.num_items, num_pairs, _ = BINARY_HEADER.unpack_from(self.map)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            self.map.close()
+            raise ValueError(f"{filepath} is not a binary dataset")
+
+        position = BINARY_HEADER.size
+        arrays = []
+        for count in (self.num_transactions + 1, num_pairs, self.num_items + 1, num_pairs, self.num_items + 1):
+            arrays.append(self.uint32_view(position, count))
+            position += 4 * count
+        self.txn_offsets, self.txn_items, self.tid_offsets, self.tids, label_offsets = arrays
+
+        labels = [self.map[position + label_offsets[j]:position + label_offsets[j + 1]].decode("utf-8") for j in range(self.num_items)]
+        self.encoder = ItemEncoder.from_labels(labels) #the ids the file was written with
+
+    def uint32_view(self, position, count):
+        if sys.byteorder == "big":
+            values = array('I', self.map[position:position + 4 * count]) #copy, the file is little endian
+            values.byteswap()
+            return memoryview(values)
+        return memoryview(self.map)[position:position + 4 * count].cast('I')
+
+    def support(self, item_id):
+        return self.tid_offsets[item_id + 1] - self.tid_offsets[item_id]
+
+    # Item ids of every transaction, in ascending id order
+    def transactions(self):
+        offsets, items = self.txn_offsets, self.txn_items
+        for tid in range(self.num_transactions):
+            yield items[offsets[tid]:offsets[tid + 1]]
+
+    # TIDs of item_id, in ascending order
+    def tidlist(self, item_id):
+        return self.tids[self.tid_offsets[item_id]:self.tid_offsets[item_id + 1]]
+
+# Load a horizontal file (one transaction per line, items separated by spaces) or a binary dataset
+# returns the item encoder and the transactions as sorted tuples of item ids
+def load_horizontal(filepath):
+    if is_binary(filepath):
+        data = BinaryDataset(filepath)
+        return data.encoder, [tuple(transaction) for transaction in data.transactions()]
+
+    # first pass: item supports, needed to assign ids in support order
+    # a transaction is a set, an item repeated on a line counts once
+    supports = Counter()
+    with open(filepath, 'r') as f:
+        for line in f:
+            supports.update(set(line.split()))
+    encoder = ItemEncoder(supports)
+
+    # second pass: encode every transaction
+    ids = encoder.ids
+    transactions = []
+    with open(filepath, 'r') as f:
+        for line in f:
+            transactions.append(tuple(sorted(map(ids.__getitem__, set(line.split())))))
+    return encoder, transactions
+
+# Load a vertical file (lines like "item: tid1,tid2,..") or a binary dataset
+# returns the item encoder, item id -> set of dense TIDs (0..N-1) and the number of transactions N
+def load_vertical(filepath):
+    if is_binary(filepath):
+        data = BinaryDataset(filepath)
+        return data.encoder, {item_id: set(data.tidlist(item_id)) for item_id in range(data.num_items)}, data.num_transactions
+
+    tid_lists = {}
+    tid_objects = [] #tid_objects[t] is t, so every tidlist shares one int object per TID
+    with open(filepath, 'r') as f:
+        for line in f:
+            if ':' in line:
+                item, tids = line.split(':', 1)
+                tid_list = list(map(int, tids.strip().strip(',').split(',')))
+                top = max(tid_list)
+                if top >= len(tid_objects):
+                    tid_objects.extend(range(len(tid_objects), top + 1))
+                tid_lists[item.strip()] = set(map(tid_objects.__getitem__, tid_list))
+
+    # TIDs that never occur (e.g. empty transactions) leave gaps, close them so TIDs stay dense
+    all_tids = set().union(*tid_lists.values())
+    if len(all_tids) != len(tid_objects):
+        dense = {tid: i for i, tid in enumerate(sorted(all_tids))}
+        tid_lists = {item: set(map(dense.__getitem__, tids)) for item, tids in tid_lists.items()}
+
+    encoder = ItemEncoder({item: len(tids) for item, tids in tid_lists.items()})
+    vertical_db = {encoder.encode(item): tids for item, tids in tid_lists.items()}
+    return encoder, vertical_db, len(all_tids)
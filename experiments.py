@@ -2,6 +2,8 @@ import os
 import re
 import csv
 
+# Summarizes results files of runs made by hand, benchmark.py runs and times the experiments itself
+
 RESULTS_DIR = "Results"
 OUTPUT_CSV = "experiment_summary.csv"  
 
@@ -25,7 +27,7 @@ def parse_output_file(filepath):
     }
 
     #Match files with the expected naming convention
-    match = re.match(r"(.+?)_(vertical|horizontal)_(apriori|eclat|declat)_(\d+)_output\.txt", stats["filename"])
+    match = re.match(r"(.+?)_(vertical|horizontal)_(apriori|eclat|declat|fpgrowth)_(\d+)_output\.txt", stats["filename"])
     if match:
         dataset, _, algo, support = match.groups()
         stats["dataset"] = dataset
@@ -42,9 +44,6 @@ def parse_output_file(filepath):
             found = re.findall(r"\d+", line)
             if found:
                 stats["min_support"] = int(found[0])
-        #if it wasn't found in the file, fall back to filename (this is for eclat files)
-        if stats["min_support"] is None:
-            stats["min_support"] = stats["support_value"]
         elif "Mining Time:" in line:
             stats["mining_time"] = float(re.findall(r"[\d.]+", line)[0])
         elif "Peak Memory" in line:
@@ -56,6 +55,10 @@ def parse_output_file(filepath):
         elif "Total Runtime" in line:
             stats["total_runtime"] = float(re.findall(r"[\d.]+", line)[0])
 
+    #if it wasn't found in the file, fall back to filename (this is for eclat files)
+    if stats["min_support"] is None:
+        stats["min_support"] = stats["support_value"]
+
     return stats
 
 def main():
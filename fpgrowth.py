@@ -0,0 +1,246 @@
+import argparse
+import os
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+from encoding import BinaryDataset, ItemEncoder, is_binary
+from sinks import OUTPUTS, ListSink, make_sink
+from rules import IndexingSink, SupportIndex, rules_path, write_rules
+from instrument import MEMORY_TRACKERS, make_tracker
+from cache import CachingSink, ResultCache
+
+# FP-tree node, __slots__ keeps each node to a handful of pointers
+class FPNode:
+    __slots__ = ("item", "count", "parent", "children")
+
+    def __init__(self, item, parent):
+        self.item = item # item id, None for the root
+        self.count = 0 # transactions sharing the path from the root to this node
+        self.parent = parent
+        self.children = {} # item id -> child node
+
+# Prefix tree of transactions whose items are in descending support order
+class FPTree:
+    def __init__(self):
+        self.root = FPNode(None, None)
+        self.header = defaultdict(list) # item id -> every node holding that item
+
+    # Add a path of items (in tree order) seen count times
+    def insert(self, path, count):
+        node = self.root
+        for item in path:
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                self.header[item].append(child)
+            child.count += count
+            node = child
+
+    # The (item, count) pairs of the tree if it is a single path, otherwise None
+    def single_path(self):
+        path = []
+        node = self.root
+        while node.children:
+            if len(node.children) > 1:
+                return None
+            node = next(iter(node.children.values()))
+            path.append((node.item, node.count))
+        return path
+
+class FPGrowth:
+    def __init__(self, minsup, output="memory", sink=None, min_conf=None, memory="tracemalloc", cache=None):
+        self.minsup = minsup # minimum support threshold
+        self.output = output # where itemsets go: "memory", "text", "binary" or "count"
+        self.sink = sink # receives itemsets while mining, built from output when not given
+        self.tree = None # FP-tree of the whole database
+        self.encoder = None # item label <-> item id dictionary
+        self.num_transactions = 0
+        self.frequent_itemsets = [] # stores frequent itemsets and their support count (when output is "memory")
+        self.stats = {} # stores performance metrics (runtime, memory)
+        self.min_conf = min_conf # confidence threshold of the rule stage, None skips it
+        self.support_index = None # itemset -> support, for the rule stage
+        self.num_rules = 0
+        self.memory = memory # memory tracking: "tracemalloc", "rss" (sampled) or "none"
+        self.cache = cache # ResultCache answering repeated runs, None mines every time
+        self.cached = None # cached run this run was answered from
+        self.cache_input = None # file the cache entry is keyed on when the input is a converted copy of it
+
+ # Build the FP-tree in two passes over a horizontal file
+    def load_horizontal_data(self, filepath):
+        start_time = time.time()
+        if is_binary(filepath):
+            tree = self.load_binary_data(filepath)
+            self.stats["load_time"] = time.time() - start_time
+            return tree
+
+        # first pass: item supports, an item repeated on a line counts once
+        supports = Counter()
+        with open(filepath, 'r') as f:
+            for line in f:
+                supports.update(set(line.split()))
+        self.encoder = ItemEncoder(supports)
+
+        # second pass: insert the frequent items of every transaction,
+        # ids follow ascending support so descending ids put the most frequent items near the root
+        frequent = {label: item_id for label, item_id in self.encoder.ids.items() if supports[label] >= self.minsup}
+        tree = FPTree()
+        self.num_transactions = 0
+        with open(filepath, 'r') as f:
+            for line in f:
+                self.num_transactions += 1
+                path = sorted((frequent[label] for label in set(line.split()) if label in frequent), reverse=True)
+                if path:
+                    tree.insert(path, 1)
+
+        self.stats["load_time"] = time.time() - start_time
+        return tree
+
+ # Build the FP-tree from a binary dataset, supports and item ids are stored in the file
+    def load_binary_data(self, filepath):
+        data = BinaryDataset(filepath)
+        self.encoder = data.encoder
+        self.num_transactions = data.num_transactions
+        # the file's ids follow ascending support when it was written here, but only the stored supports are relied on
+        frequent = [data.support(item_id) >= self.minsup for item_id in range(data.num_items)]
+        tree = FPTree()
+        for transaction in data.transactions():
+            path = [item_id for item_id in reversed(transaction) if frequent[item_id]]
+            if path:
+                tree.insert(path, 1)
+        return tree
+
+# Mine a (conditional) FP-tree, every itemset found is extended with suffix
+    def mine_tree(self, tree, suffix):
+        path = tree.single_path()
+        if path is not None:
+            # every combination of the path's items is frequent, its support is the count of its deepest node
+            for size in range(1, len(path) + 1):
+                for combination in combinations(path, size):
+                    self.sink.emit(suffix + [item for item, _ in combination], combination[-1][1])
+            return
+
+        # least frequent items first
+        for item in sorted(tree.header):
+            nodes = tree.header[item]
+            support = sum(node.count for node in nodes)
+            if support < self.minsup:
+                continue
+            itemset = suffix + [item]
+            self.sink.emit(itemset, support)
+
+            # conditional pattern base: the prefix path of every node holding item
+            pattern_base = []
+            local_supports = defaultdict(int)
+            for node in nodes:
+                prefix_path = []
+                parent = node.parent
+                while parent.item is not None:
+                    prefix_path.append(parent.item)
+                    parent = parent.parent
+                if prefix_path:
+                    pattern_base.append((prefix_path, node.count))
+                    for prefix_item in prefix_path:
+                        local_supports[prefix_item] += node.count
+
+            # conditional FP-tree over the items that stay frequent together with itemset
+            frequent = {prefix_item for prefix_item, count in local_supports.items() if count >= self.minsup}
+            if frequent:
+                conditional_tree = FPTree()
+                for prefix_path, count in pattern_base:
+                    # prefix paths run from the node up to the root, the tree wants root first
+                    filtered = [prefix_item for prefix_item in reversed(prefix_path) if prefix_item in frequent]
+                    if filtered:
+                        conditional_tree.insert(filtered, count)
+                self.mine_tree(conditional_tree, itemset)
+
+# Run the algorithm
+    def run(self, filepath):
+        memory_tracker = make_tracker(self.memory) #start memory tracking
+        memory_tracker.start()
+        if self.cache is not None:
+            self.cached = self.cache.lookup(self.cache_input or filepath, self.minsup)
+        if self.cached is not None:
+            self.encoder, self.num_transactions = self.cached.encoder, self.cached.num_transactions
+        else:
+            self.tree = self.load_horizontal_data(filepath) #build the FP-tree
+
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        if self.min_conf is not None:
+            self.support_index = SupportIndex()
+            self.sink = IndexingSink(self.sink, self.support_index) #rules need the support of every itemset
+        if self.cache is not None and self.cached is None:
+            self.sink = CachingSink(self.sink, self.cache, self.cache_input or filepath, self.minsup, "all", self.num_transactions)
+
+        start_time = time.time() # start timing
+
+        self.sink.open(self.encoder)
+        if self.cached is not None:
+            self.cached.replay(self.sink, self.minsup) #itemsets of a cached run at this or a lower minsup
+        else:
+            self.mine_tree(self.tree, []) #run FP-growth
+        self.sink.close()
+        self.stats["mining_time"] = time.time() - start_time #track mining runtime
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+        if self.min_conf is not None:
+            start_time = time.time()
+            self.num_rules = write_rules(self.support_index, self.min_conf, self.encoder.decode, rules_path(self.output_path(filepath)))
+            self.stats["rule_gen_time"] = time.time() - start_time
+
+    def output_path(self, input_path):
+        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+        return f"Results/{dataset_name}_fpgrowth_{self.minsup}_output.txt"
+
+# Output frequent itemsets and performance metrics
+    def print_results(self, input_path):
+        output_path = self.output_path(input_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # a text sink already streamed the itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
+
+            f.write("\n== Execution Statistics ==\n")
+            f.write(f"Transactions: {self.estimate_num_transactions()}\n")
+            f.write(f"Min Support: {self.minsup}\n")
+            f.write(f"Memory Tracking: {self.memory}\n")
+            if self.cached is not None:
+                f.write(f"Answered From Cache: {self.cached.path} (minsup {self.cached.minsup})\n")
+            if self.min_conf is not None:
+                f.write(f"Rules: {self.num_rules} at min confidence {self.min_conf}, written to {rules_path(output_path)}\n")
+            for k, v in self.stats.items():
+                label = k.replace("_", " ").title()
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n" if k.endswith("MB") else f"{label}: {v}\n")
+
+        print(f"Results written to: {output_path}")
+
+ # Count number of transactions (for scalability reporting)
+    def estimate_num_transactions(self):
+        return self.num_transactions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python fpgrowth.py <horizontal_data_file|binary_dataset> <minsup> [--output text|binary|count] [--min-conf C] [--memory tracemalloc|rss|none] [--cache]")
+    parser.add_argument("filepath")
+    parser.add_argument("minsup", type=int)
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--min-conf", type=float) #also generate association rules at this confidence
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc") #rss samples the process instead of tracing allocations
+    parser.add_argument("--cache", action="store_true") #answer from and add to the result cache
+    args = parser.parse_args()
+
+    filepath = args.filepath
+    minsup = args.minsup
+
+    fpgrowth = FPGrowth(minsup, output=args.output, min_conf=args.min_conf, memory=args.memory, cache=ResultCache() if args.cache else None)
+    fpgrowth.run(filepath)
+    fpgrowth.print_results(filepath)
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from apriori import Apriori, CandidateTrie
+from encoding import BinaryDataset, ItemEncoder, is_binary
+from sinks import OUTPUTS, ListSink, make_sink
+from instrument import make_tracker
+from rules import IndexingSink, SupportIndex
+
+# Incremental Apriori in the style of FUP: a run saves the frequent itemsets and the negative border
+# (candidates whose subsets are all frequent but which are not) with their supports, and an update with
+# a delta file of appended transactions only counts the delta, rescanning the database for the few
+# candidates that were outside both and could have become frequent
+#
+# the threshold keeps the relative support of the first run, minsup × N / N0 rounded up, so a growing
+# database does not make everything frequent
+# itemsets are kept as sorted tuples of labels, item ids follow supports and change with every delta
+
+STATE_VERSION = 1
+
+# Transactions of a horizontal or binary dataset as sorted tuples of labels, streamed
+def read_transactions(filepath):
+    if is_binary(filepath):
+        data = BinaryDataset(filepath)
+        labels = data.encoder.labels
+        for transaction in data.transactions():
+            yield tuple(sorted(labels[item_id] for item_id in transaction))
+        return
+    with open(filepath, "r") as f:
+        for line in f:
+            yield tuple(sorted(set(line.split()))) #an item repeated on a line counts once
+
+# Supports of candidates (sorted label tuples of size k) over transactions, with Apriori's prefix trie
+def count_supports(candidates, k, transactions):
+    trie = CandidateTrie(candidates, k)
+    for transaction in transactions:
+        trie.count(transaction)
+    return trie.counts
+
+class FUP(Apriori):
+    def __init__(self, minsup=0, output="memory", sink=None):
+        super().__init__(minsup, output=output, sink=sink)
+        self.files = [] #[path, size in bytes] of every file making up the database
+        self.base_minsup = minsup #minsup and transactions of the first run, the threshold keeps their ratio
+        self.base_transactions = 0
+        self.num_transactions = 0
+        self.frequent = {} #label tuple -> support
+        self.border = {} #label tuple -> support, infrequent itemsets whose subsets are all frequent
+        self.bounds = {} #label tuple -> upper bound on the support, border itemsets that were never counted exactly
+        self.border_ids = {} #id tuple -> support, border collected by the first run
+        self.item_supports = Counter() #item id -> support, for the border's items
+        self.rescanned = 0 #candidates counted over the database by the last update
+        self.rescans = 0 #passes over the database made by the last update
+
+    # Collect the negative border while Apriori counts each level
+    def get_candidate_supports(self, candidates):
+        support_dict = super().get_candidate_supports(candidates)
+        for candidate in candidates:
+            if support_dict[candidate] < self.minsup:
+                self.border_ids[candidate] = support_dict[candidate]
+        return support_dict
+
+    # Item supports are taken before Apriori trims the database
+    def load_horizontal_data(self, filepath):
+        transactions = super().load_horizontal_data(filepath)
+        self.item_supports = Counter()
+        for transaction, weight in zip(transactions, self.weights):
+            for item in transaction:
+                self.item_supports[item] += weight
+        return transactions
+
+    # First run: mine filepath with Apriori and keep its frequent itemsets and negative border
+    def run(self, filepath):
+        index = SupportIndex()
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        self.sink = IndexingSink(self.sink, index) #the state needs the support of every frequent itemset
+        super().run(filepath)
+
+        decode = self.encoder.decode
+        # every infrequent item is on the border, so the state knows the support of every item
+        self.border_ids.update(((item,), support) for item, support in self.item_supports.items() if support < self.minsup)
+        self.frequent = {tuple(sorted(decode(itemset))): support for itemset, support in index.supports.items()}
+        self.border = {tuple(sorted(decode(itemset))): support for itemset, support in self.border_ids.items()}
+        self.border_ids = {}
+        self.files = [[filepath, os.path.getsize(filepath)]]
+        self.base_transactions = self.num_transactions
+        self.horizontal_db, self.weights, self.item_supports = [], [], Counter()
+
+    # Absolute threshold for a database of num_transactions
+    def threshold(self, num_transactions):
+        return -(-self.base_minsup * num_transactions // self.base_transactions)
+
+    # Transactions of every file of the database, checking none of them changed since the state was saved
+    def database(self):
+        for path, size in self.files:
+            if os.path.getsize(path) != size:
+                raise ValueError(f"{path} changed since it was mined, append new transactions as a delta file")
+        for path, _ in self.files:
+            yield from read_transactions(path)
+
+    # Update the state with the transactions appended in delta_path
+    def update(self, delta_path):
+        memory_tracker = make_tracker(self.memory)
+        memory_tracker.start()
+        start_time = time.time()
+        delta = list(read_transactions(delta_path))
+        self.stats["load_time"] = time.time() - start_time
+
+        start_time = time.time()
+        old_minsup = self.threshold(self.num_transactions)
+        self.minsup = self.threshold(self.num_transactions + len(delta))
+        old_frequent, old_border, old_bounds = self.frequent, self.border, self.bounds
+        self.frequent, self.border, self.bounds = {}, {}, {}
+        self.rescanned = self.rescans = 0
+
+        # level 1: the state knows the support of every item, items first seen in the delta had none
+        delta_supports = Counter((item,) for transaction in delta for item in transaction)
+        for itemset in old_frequent.keys() | old_border.keys() | delta_supports.keys():
+            if len(itemset) > 1:
+                continue
+            support = old_frequent.get(itemset, old_border.get(itemset, 0)) + delta_supports[itemset]
+            if support >= self.minsup:
+                self.frequent[itemset] = support
+            else:
+                self.border[itemset] = support
+        items = sorted(itemset for itemset in self.frequent if len(itemset) == 1)
+
+        while items:
+            k = len(items[0]) + 1
+            candidates = self.generate_candidates(items)
+            subset_delta = delta_supports #delta supports of the (k-1)-itemsets
+            delta_supports = count_supports(candidates, k, delta) if candidates else {}
+            supports = {} #candidate -> support in the database before the delta
+            rescan = []
+            for candidate in candidates:
+                if candidate in old_frequent:
+                    supports[candidate] = old_frequent[candidate]
+                elif candidate in old_border:
+                    supports[candidate] = old_border[candidate]
+                else:
+                    # outside the old frequent itemsets and border, so some subset was infrequent: the support
+                    # was below the old threshold, and it is at most the old support of every subset
+                    bound = min(old_minsup - 1, old_bounds.get(candidate, old_minsup - 1))
+                    for d in range(k):
+                        subset = candidate[:d] + candidate[d + 1:]
+                        bound = min(bound, self.frequent[subset] - subset_delta.get(subset, 0))
+                    bound += delta_supports.get(candidate, 0)
+                    if bound >= self.minsup:
+                        rescan.append(candidate) #may have become frequent, count it in the database
+                    else:
+                        self.bounds[candidate] = bound
+            if rescan:
+                rescan_supports = count_supports(rescan, k, self.database())
+                supports.update((candidate, rescan_supports[candidate]) for candidate in rescan)
+                self.rescanned += len(rescan)
+                self.rescans += 1
+
+            items = []
+            for candidate, support in supports.items():
+                support += delta_supports.get(candidate, 0)
+                if support >= self.minsup:
+                    self.frequent[candidate] = support
+                    items.append(candidate)
+                else:
+                    self.border[candidate] = support
+            items.sort()
+
+        self.num_transactions += len(delta)
+        self.files.append([delta_path, os.path.getsize(delta_path)])
+        self.stats["mining_time"] = time.time() - start_time
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+    # Send the frequent itemsets of the state to the sink
+    def emit_frequent(self, filepath):
+        self.encoder = ItemEncoder({itemset[0]: support for itemset, support in {**self.border, **self.frequent}.items() if len(itemset) == 1})
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+        self.sink.open(self.encoder)
+        for itemset, support in self.frequent.items():
+            self.sink.emit(tuple(sorted(map(self.encoder.encode, itemset))), support)
+        self.sink.close()
+
+    def save(self, state_path):
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        state = {
+            "version": STATE_VERSION, "files": self.files,
+            "base_minsup": self.base_minsup, "base_transactions": self.base_transactions, "num_transactions": self.num_transactions,
+            "frequent": [[list(itemset), support] for itemset, support in self.frequent.items()],
+            "border": [[list(itemset), support] for itemset, support in self.border.items()],
+            "bounds": [[list(itemset), support] for itemset, support in self.bounds.items()],
+        }
+        with open(state_path, "w") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, state_path, output="memory", sink=None):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"{state_path} is not an incremental mining state")
+        fup = cls(state["base_minsup"], output=output, sink=sink)
+        fup.files = state["files"]
+        fup.base_transactions = state["base_transactions"]
+        fup.num_transactions = state["num_transactions"]
+        fup.minsup = fup.threshold(fup.num_transactions)
+        fup.frequent = {tuple(itemset): support for itemset, support in state["frequent"]}
+        fup.border = {tuple(itemset): support for itemset, support in state["border"]}
+        fup.bounds = {tuple(itemset): support for itemset, support in state["bounds"]}
+        return fup
+
+    def output_path(self, input_path):
+        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+        return f"Results/{dataset_name}_fup_{self.minsup}_output.txt"
+
+    def estimate_num_transactions(self):
+        return self.num_transactions
+
+    def print_results(self, input_path):
+        super().print_results(input_path)
+        with open(self.output_path(input_path), "a") as f:
+            f.write(f"Database Files: {len(self.files)}\n")
+            f.write(f"Rescanned Candidates: {self.rescanned} in {self.rescans} database passes\n")
+
+# State file next to the results of the first run on a dataset
+def state_path(input_path):
+    dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+    return f"Results/{dataset_name}_fup_state.json"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python incremental.py <horizontal_data_file> <minsup> | --update <state_file> <delta_file> [--output text|binary|count]")
+    parser.add_argument("filepath") #dataset of the first run, or the state file with --update
+    parser.add_argument("minsup_or_delta") #minsup of the first run, or the delta file with --update
+    parser.add_argument("--update", action="store_true") #add the delta's transactions to a saved state
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    args = parser.parse_args()
+
+    if args.update:
+        fup = FUP.load(args.filepath, output=args.output)
+        results_input = fup.files[0][0] #results are named after the first run's dataset
+        fup.update(args.minsup_or_delta)
+        fup.emit_frequent(results_input)
+        fup.save(args.filepath)
+        print(f"{fup.rescanned} candidates counted in {fup.rescans} database passes")
+        print(f"State updated: {args.filepath}")
+    else:
+        fup = FUP(int(args.minsup_or_delta), output=args.output)
+        results_input = args.filepath
+        fup.run(results_input)
+        fup.save(state_path(results_input))
+        print(f"State saved to: {state_path(results_input)}")
+    fup.print_results(results_input)
@@ -0,0 +1,119 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+# Mining instrumentation: counters per Apriori level or Eclat/dEclat recursion depth, spans for a trace viewer,
+# and a choice of memory tracker, since tracemalloc hooks every allocation and slows the miners down
+
+MEMORY_TRACKERS = ("tracemalloc", "rss", "none")
+
+COUNTERS = ("candidates", "pruned", "infrequent", "frequent", "intersections", "tidlist_size", "time")
+
+# Counters by level (itemset size) and spans of the mining run
+class Trace:
+    def __init__(self):
+        self.levels = defaultdict(lambda: dict.fromkeys(COUNTERS, 0)) #itemset size -> counters
+        self.events = [] #Chrome trace events, complete ("X") spans in microseconds
+        self.origin = time.perf_counter()
+
+    # Add counts (and seconds spent) to the counters of itemsets of size level
+    def record(self, level, seconds=0.0, **counts):
+        counters = self.levels[level]
+        counters["time"] += seconds
+        for name, count in counts.items():
+            counters[name] += count
+
+    # Record a span that started at perf_counter() value start and ends now
+    def span(self, name, start, **args):
+        end = time.perf_counter()
+        self.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": 0,
+                            "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6, "args": args})
+
+    # Per-level counters with the average size of the tidlists (or diffsets) built at that level
+    def rows(self):
+        rows = []
+        for level in sorted(self.levels):
+            counters = self.levels[level]
+            average = counters["tidlist_size"] / counters["frequent"] if counters["frequent"] else 0
+            rows.append({"level": level, **counters, "avg_tidlist_size": round(average, 2)})
+        return rows
+
+    # Write the trace as Chrome trace event JSON (chrome://tracing, Perfetto), the counters under "levels"
+    def export(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "levels": self.rows()}, f)
+
+    def write_levels(self, f):
+        f.write("\n== Levels ==\n")
+        f.write("Level Candidates Pruned Infrequent Frequent Intersections AvgTidlist Time\n")
+        for row in self.rows():
+            f.write(f"{row['level']} {row['candidates']} {row['pruned']} {row['infrequent']} {row['frequent']} "
+                    f"{row['intersections']} {row['avg_tidlist_size']} {row['time']:.4f}\n")
+
+# Trace file next to a miner's results file
+def trace_path(results_path):
+    return results_path.replace("_output.txt", "_trace.json")
+
+# Peak traced Python allocations, exact but slow on allocation heavy code
+class TracemallocTracker:
+    def start(self):
+        tracemalloc.start()
+
+    def peak_mb(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return round(peak / (1024 * 1024), 2)
+
+# Current resident set size of this process in bytes, the lifetime peak where /proc is missing (macOS)
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+# Peak RSS sampled by a background thread, allocations run at full speed
+class RSSTracker:
+    def __init__(self, interval=0.01):
+        self.interval = interval #seconds between samples
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.peak = current_rss()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def peak_mb(self):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+        return round(self.peak / (1024 * 1024), 2)
+
+# No memory tracking, peak_mb() is None
+class NoTracker:
+    def start(self):
+        pass
+
+    def peak_mb(self):
+        return None
+
+# Build the tracker for a --memory choice
+def make_tracker(name):
+    if name == "rss":
+        return RSSTracker()
+    if name == "none":
+        return NoTracker()
+    return TracemallocTracker()
@@ -0,0 +1,40 @@
+import multiprocessing
+import tracemalloc
+
+# Process pool over the top-level equivalence classes of a vertical miner
+# once a top-level item's class is known it is an independent subproblem, so each worker
+# mines whole classes and the parent merges their itemsets
+
+_miner = None #miner shared with each worker (inherited on fork, pickled on spawn)
+
+def _init_worker(miner):
+    global _miner
+    _miner = miner
+    # memory tracking belongs to the parent, it would only slow the workers down
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def _mine_class(index):
+    return index, _miner.mine_class(index)
+
+# Mine classes 0..len(estimates)-1 with miner.mine_class(index) on `workers` processes
+# classes are handed out largest estimate first so the big ones do not finish last,
+# and their itemsets are passed to emit(itemset, support) in class order as soon as
+# every earlier class is done, so the output is deterministic
+def mine_classes(miner, estimates, workers, emit):
+    schedule = sorted(range(len(estimates)), key=lambda index: (-estimates[index], index))
+    pending = {} #finished classes waiting for an earlier class
+    next_index = 0
+
+    # the parent's sink stays behind: a file sink cannot be pickled for spawned workers, which build their own
+    sink, miner.sink = miner.sink, None
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(miner,)) as pool:
+            for index, itemsets in pool.imap_unordered(_mine_class, schedule):
+                pending[index] = itemsets
+                while next_index in pending:
+                    for itemset, support in pending.pop(next_index):
+                        emit(itemset, support)
+                    next_index += 1
+    finally:
+        miner.sink = sink
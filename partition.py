@@ -0,0 +1,189 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from encoding import BINARY_SUFFIX, ItemEncoder, load_vertical, write_binary
+from sinks import OUTPUTS, ListSink, make_sink
+from instrument import MEMORY_TRACKERS, make_tracker
+from incremental import read_transactions
+from sampling import ENGINES, count_itemsets, mine
+
+# Partitioned mining in the style of SON, for datasets that do not fit in memory
+# pass 1 splits the horizontal file into chunks of a fixed number of transactions (each written as a binary
+# dataset), mines every chunk with any engine at the proportional threshold minsup × n / N rounded up, and
+# takes the union of the local results as the global candidates: an itemset below the threshold in every
+# chunk is below minsup in the whole database, so no frequent itemset is missed
+# pass 2 reads the chunks again and counts the candidates exactly by prefix-shared tidlist intersections, one
+# itemset size at a time so that a candidate with a globally infrequent subset is never counted
+# the parent only holds one chunk at a time (and the candidates), the workers one chunk each
+
+CHUNK_TRANSACTIONS = 10000
+
+_engine = None #engine the workers mine their chunks with
+
+def _init_worker(engine):
+    global _engine
+    _engine = engine
+    # memory tracking belongs to the parent, it would only slow the workers down
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+# Pass 1: frequent itemsets of one chunk at its local threshold, as sorted label tuples
+def _mine_chunk(chunk):
+    path, local_minsup = chunk
+    miner = mine(_engine, path, local_minsup, "none")
+    decode = miner.encoder.decode
+    return [tuple(sorted(decode(itemset))) for itemset, _ in miner.frequent_itemsets]
+
+# Pass 2: supports of candidates (sorted label tuples) in one chunk of local threshold minsup, candidates with
+# an item missing from the chunk do not occur in it
+def _count_chunk(task):
+    path, local_minsup, level = task
+    encoder, tid_lists, num_transactions = load_vertical(path)
+    ids = encoder.ids
+    candidates = {tuple(sorted(ids[label] for label in candidate)): candidate
+                  for candidate in level if all(label in ids for label in candidate)}
+    supports = count_itemsets(candidates, tid_lists, local_minsup, num_transactions)
+    return {candidates[itemset]: support for itemset, support in supports.items()}
+
+class SON:
+    def __init__(self, minsup, engine="apriori", chunk_size=CHUNK_TRANSACTIONS, workers=None, output="memory", sink=None, memory="tracemalloc"):
+        self.minsup = minsup #minimum support threshold on the full database
+        self.engine = engine #miner run on every chunk
+        self.chunk_size = chunk_size #transactions per chunk
+        self.workers = workers or os.cpu_count() #processes mining and counting chunks
+        self.output = output
+        self.sink = sink
+        self.memory = memory
+        self.encoder = None
+        self.num_transactions = 0
+        self.chunks = [] #(binary chunk file, transactions in it)
+        self.num_candidates = 0 #union of the chunks' local frequent itemsets
+        self.num_counted = 0 #candidates left after pruning those with an infrequent subset
+        self.frequent_itemsets = []
+        self.stats = {}
+
+    # Pass 1 input: split filepath (horizontal or binary) into binary chunk files in directory,
+    # returns the support of every item
+    def partition(self, filepath, directory):
+        start_time = time.time()
+        item_supports = Counter()
+        chunk = []
+        for transaction in read_transactions(filepath):
+            chunk.append(transaction)
+            if len(chunk) == self.chunk_size:
+                self.write_chunk(chunk, directory, item_supports)
+                chunk = []
+        if chunk:
+            self.write_chunk(chunk, directory, item_supports)
+        self.num_transactions = sum(n for _, n in self.chunks)
+        self.stats["load_time"] = time.time() - start_time
+        return item_supports
+
+    def write_chunk(self, chunk, directory, item_supports):
+        supports = Counter(label for transaction in chunk for label in transaction)
+        item_supports.update(supports)
+        encoder = ItemEncoder(supports)
+        path = os.path.join(directory, f"chunk_{len(self.chunks)}{BINARY_SUFFIX}")
+        write_binary(path, encoder, (sorted(map(encoder.encode, transaction)) for transaction in chunk))
+        self.chunks.append((path, len(chunk)))
+
+    # Threshold of a chunk of n transactions: a support below minsup × n / N in every chunk sums to less than minsup
+    def local_minsup(self, n):
+        return max(1, -(-self.minsup * n // self.num_transactions))
+
+    def run(self, filepath):
+        memory_tracker = make_tracker(self.memory)
+        memory_tracker.start()
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+
+        with tempfile.TemporaryDirectory(prefix="son_") as directory:
+            self.chunks = []
+            self.encoder = ItemEncoder(self.partition(filepath, directory))
+
+            start_time = time.time()
+            candidates = set()
+            with multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self.engine,)) as pool:
+                for itemsets in pool.imap_unordered(_mine_chunk, [(path, self.local_minsup(n)) for path, n in self.chunks]):
+                    candidates.update(itemsets)
+                self.stats["local_mining_time"] = time.time() - start_time
+                self.num_candidates = len(candidates)
+
+                count_time = time.time()
+                by_size = defaultdict(list)
+                for candidate in candidates:
+                    by_size[len(candidate)].append(candidate)
+                del candidates
+                frequent = {} #label tuple -> support
+                for k in sorted(by_size):
+                    level = [candidate for candidate in by_size.pop(k)
+                             if k == 1 or all(candidate[:d] + candidate[d + 1:] in frequent for d in range(k))]
+                    if not level:
+                        break #no frequent k-itemset, so no larger one either
+                    self.num_counted += len(level)
+                    supports = Counter()
+                    for chunk_supports in pool.imap_unordered(_count_chunk, [(path, self.local_minsup(n), level) for path, n in self.chunks]):
+                        supports.update(chunk_supports)
+                    frequent.update((candidate, support) for candidate, support in supports.items() if support >= self.minsup)
+                self.stats["count_time"] = time.time() - count_time
+
+        self.sink.open(self.encoder)
+        encode = self.encoder.encode
+        frequent = [(tuple(sorted(map(encode, itemset))), support) for itemset, support in frequent.items()]
+        for itemset, support in sorted(frequent, key=lambda entry: (len(entry[0]), entry[0])):
+            self.sink.emit(itemset, support)
+        self.sink.close()
+        self.stats["mining_time"] = time.time() - start_time
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+    def output_path(self, input_path):
+        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+        return f"Results/{dataset_name}_son_{self.engine}_{self.minsup}_output.txt"
+
+    def print_results(self, input_path):
+        output_path = self.output_path(input_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # a text sink already streamed the itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
+
+            f.write("\n== Execution Statistics ==\n")
+            f.write(f"Transactions: {self.num_transactions}\n")
+            f.write(f"Min Support: {self.minsup}\n")
+            f.write(f"Chunks: {len(self.chunks)} of up to {self.chunk_size} transactions, mined with {self.engine} on {self.workers} workers\n")
+            f.write(f"Candidates: {self.num_candidates} local frequent itemsets, {self.num_counted} counted exactly\n")
+            f.write(f"Memory Tracking: {self.memory} (parent process)\n")
+            for k, v in self.stats.items():
+                label = k.replace("_", " ").title()
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n")
+
+        print(f"Results written to: {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python partition.py <data_file> <minsup> [--engine apriori|eclat|declat|fpgrowth] [--chunk-size N] [--workers N] [--output text|binary|count] [--memory tracemalloc|rss|none]")
+    parser.add_argument("filepath") #horizontal or binary dataset
+    parser.add_argument("minsup", type=int)
+    parser.add_argument("--engine", choices=ENGINES, default="apriori")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_TRANSACTIONS) #transactions per chunk, bounds the memory of a worker
+    parser.add_argument("--workers", type=int) #processes mining and counting chunks, every CPU by default
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc")
+    args = parser.parse_args()
+
+    son = SON(args.minsup, engine=args.engine, chunk_size=args.chunk_size, workers=args.workers, output=args.output, memory=args.memory)
+    son.run(args.filepath)
+    son.print_results(args.filepath)
+    print(f"{son.num_candidates} candidates from {len(son.chunks)} chunks")
@@ -2,16 +2,18 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import os
+import sys
 
-# Load CSV
-df = pd.read_csv("experiment_summary.csv")
+# Load CSV: experiment_summary.csv from experiments.py, or a benchmark.py summary given on the command line
+df = pd.read_csv(sys.argv[1] if len(sys.argv) > 1 else "experiment_summary.csv")
 df = df.dropna(subset=["mining_time"])  # Remove incomplete rows
 
 # Consistent colors
 algorithm_colors = {
     "apriori": "red",
     "eclat": "green",
-    "declat": "blue"
+    "declat": "blue",
+    "fpgrowth": "purple"
 }
 
 os.makedirs("plots", exist_ok=True)
@@ -38,6 +40,9 @@ for dataset in df["dataset"].unique():
     plt.close()
 
 # === Plot 2: Peak Memory Usage Grouped by Dataset ===
+# benchmark.py runs without tracemalloc by default, its summaries always have the peak RSS
+memory_column = "peak_memory_MB" if "peak_memory_MB" in df and df["peak_memory_MB"].notna().any() else "peak_rss_MB"
+
 # Create a label column like "retail_1000"
 df["label"] = df["dataset"] + "_" + df["support_value"].astype(str)
 
@@ -53,7 +58,7 @@ plt.figure(figsize=(12, 6))
 sns.barplot(
     data=df,
     x="label",
-    y="peak_memory_MB",
+    y=memory_column,
     hue="algorithm",
     order=sorted_labels,
     palette=algorithm_colors
@@ -0,0 +1,132 @@
+import argparse
+import os
+import time
+from sinks import BUFFER_SIZE, read_binary
+
+# Association rules X => Y from the frequent itemsets of any miner
+# conf(X => Y) = sup(X ∪ Y) / sup(X), and every subset of a frequent itemset is frequent, so all the
+# supports come from a hash index over the frequent itemsets instead of another pass over the data
+
+# Support of every frequent itemset, keyed by its items as a sorted tuple
+class SupportIndex:
+    def __init__(self):
+        self.supports = {} #sorted tuple of items -> support
+
+    def add(self, itemset, support):
+        self.supports[tuple(sorted(itemset))] = support
+
+    def support(self, itemset):
+        return self.supports[itemset]
+
+    def __len__(self):
+        return len(self.supports)
+
+# Pass itemsets on to sink while indexing their supports for the rule stage
+class IndexingSink:
+    def __init__(self, sink, index):
+        self.sink = sink
+        self.index = index
+        self.path = getattr(sink, "path", None) #results file a text sink streams into
+
+    def open(self, encoder):
+        self.sink.open(encoder)
+
+    def emit(self, itemset, support):
+        self.index.add(itemset, support)
+        self.sink.emit(itemset, support)
+
+    def close(self):
+        self.sink.close()
+
+    def write_itemsets(self, f, decode):
+        self.sink.write_itemsets(f, decode)
+
+# Consequents of size m+1 whose every size-m subset is a confident consequent (prefix join of sorted tuples)
+def next_consequents(consequents):
+    confident = set(consequents)
+    joined = []
+    for i, consequent in enumerate(consequents):
+        for other in consequents[i + 1:]:
+            if consequent[:-1] != other[:-1]:
+                break
+            candidate = consequent + other[-1:]
+            # the two subsets dropping one of the last two items are the joined consequents themselves
+            if all(candidate[:j] + candidate[j + 1:] in confident for j in range(len(candidate) - 2)):
+                joined.append(candidate)
+    return joined
+
+# Rules (antecedent, consequent, confidence) of one frequent itemset (a sorted tuple), consequents grown level-wise
+# moving items from the antecedent to the consequent can only raise sup(antecedent), so confidence is anti-monotone
+# in the consequent and only confident consequents are extended
+def itemset_rules(itemset, support, index, min_conf):
+    consequents = [(item,) for item in itemset]
+    while consequents and len(consequents[0]) < len(itemset):
+        confident = []
+        for consequent in consequents:
+            antecedent = tuple(item for item in itemset if item not in consequent)
+            confidence = support / index.support(antecedent)
+            if confidence >= min_conf:
+                yield antecedent, consequent, confidence
+                confident.append(consequent)
+        consequents = next_consequents(confident)
+
+# Every rule of the indexed itemsets, as (antecedent, consequent, support, confidence)
+def generate_rules(index, min_conf):
+    for itemset, support in index.supports.items():
+        if len(itemset) > 1:
+            for antecedent, consequent, confidence in itemset_rules(itemset, support, index, min_conf):
+                yield antecedent, consequent, support, confidence
+
+# Rules file next to a miner's results file
+def rules_path(results_path):
+    return results_path.replace("_output.txt", "_rules.txt")
+
+# Stream the rules into path as "X => Y (support, confidence)" lines, returns the number of rules
+def write_rules(index, min_conf, decode, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", buffering=BUFFER_SIZE) as f:
+        f.write(f"== Association Rules (min confidence {min_conf}) ==\n")
+        for antecedent, consequent, support, confidence in generate_rules(index, min_conf):
+            f.write(f"{' '.join(decode(antecedent))} => {' '.join(decode(consequent))} ({support}, {confidence:.4f})\n")
+            count += 1
+    return count
+
+# Index the "Frequent Itemsets" section of a text results file, itemsets stay as labels
+def read_results(path):
+    index = SupportIndex()
+    with open(path, "r") as f:
+        in_itemsets = False
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("== "):
+                in_itemsets = line == "== Frequent Itemsets =="
+            elif in_itemsets and line.endswith(")") and " (" in line:
+                items, support = line.rsplit(" (", 1)
+                if support[:-1].isdigit():
+                    index.add(items.split(), int(support[:-1]))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python rules.py <results_file> <min_conf>")
+    parser.add_argument("filepath") #text results file, or the .bin file of --output binary
+    parser.add_argument("min_conf", type=float)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.filepath.endswith(".bin"):
+        index = SupportIndex()
+        for itemset, support in read_binary(args.filepath):
+            index.add(itemset, support)
+        path = rules_path(os.path.splitext(args.filepath)[0] + ".txt")
+    else:
+        index = read_results(args.filepath)
+        path = rules_path(args.filepath)
+    load_time = time.time() - start_time
+
+    start_time = time.time()
+    count = write_rules(index, args.min_conf, list, path)
+    print(f"{count} rules from {len(index)} itemsets written to: {path}")
+    print(f"Load Time: {load_time:.4f} seconds")
+    print(f"Rule Gen Time: {time.time() - start_time:.4f} seconds")
@@ -0,0 +1,244 @@
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from apriori import Apriori
+from eclat import Eclat
+from dEclat import dEclat
+from fpgrowth import FPGrowth
+from encoding import BINARY_SUFFIX, ItemEncoder, is_binary, load_horizontal, load_vertical, write_binary
+from sinks import OUTPUTS, ListSink, make_sink
+from tidlists import make_backend
+from instrument import MEMORY_TRACKERS, make_tracker
+
+# Sampling in the style of Toivonen: mine a random sample at a lowered threshold, then count the sample's
+# frequent itemsets and their negative border (itemsets whose every subset is frequent in the sample but which
+# are not) exactly over the full database
+# when no border itemset turns out frequent the result is complete: any missed frequent itemset would have a
+# minimal subset outside the sample's frequent itemsets, and that subset is on the border
+# otherwise the full database is mined exactly with the same engine
+
+ENGINES = ("apriori", "eclat", "declat", "fpgrowth")
+
+# Miner of the given engine over filepath at minsup, keeping its itemsets in memory
+def mine(engine, filepath, minsup, memory):
+    if engine == "apriori":
+        miner = Apriori(minsup, memory=memory)
+        miner.run(filepath)
+    elif engine == "eclat":
+        miner = Eclat(memory=memory)
+        miner.run(filepath, minsup)
+    elif engine == "declat":
+        miner = dEclat(minsup, memory=memory)
+        miner.run(filepath)
+    else:
+        miner = FPGrowth(minsup, memory=memory)
+        miner.run(filepath)
+    return miner
+
+# Itemsets (sorted tuples) whose every subset one item shorter is in frequent but which are not themselves
+def negative_border(items, frequent):
+    border = [(item,) for item in items if (item,) not in frequent]
+    by_size = defaultdict(list)
+    for itemset in frequent:
+        by_size[len(itemset)].append(itemset)
+    for k in sorted(by_size):
+        # prefix join of the frequent k-itemsets, as in Apriori's candidate generation
+        prefix_groups = defaultdict(list)
+        for itemset in by_size[k]:
+            prefix_groups[itemset[:-1]].append(itemset[-1])
+        for prefix, last_items in prefix_groups.items():
+            last_items.sort()
+            for i in range(len(last_items) - 1):
+                for j in range(i + 1, len(last_items)):
+                    candidate = prefix + (last_items[i], last_items[j])
+                    if candidate not in frequent and all(candidate[:d] + candidate[d + 1:] in frequent for d in range(k - 1)):
+                        border.append(candidate)
+    return border
+
+# Exact supports of itemsets (sorted tuples of item ids) by tidlist intersections in the backend Eclat would pick
+# for tid_lists (item id -> set of TIDs); itemsets are visited in sorted order so the tidlist of a shared prefix
+# is only intersected once
+def count_itemsets(itemsets, tid_lists, minsup, num_transactions):
+    backend = make_backend("auto", tid_lists.values(), minsup, num_transactions)
+    converted = {} #item -> tidlist in the backend's representation
+    supports = {}
+    path = [] #(item, tidlist of the prefix ending with item) along the current itemset
+    for itemset in sorted(itemsets):
+        common = 0
+        while common < len(path) and common < len(itemset) and path[common][0] == itemset[common]:
+            common += 1
+        del path[common:]
+        for item in itemset[common:]:
+            if item not in converted:
+                converted[item] = backend.convert(tid_lists.get(item, ()))
+            path.append((item, path[-1][1] & converted[item] if path else converted[item]))
+        supports[itemset] = backend.support(path[-1][1])
+    return supports
+
+class Sampler:
+    def __init__(self, minsup, engine="apriori", fraction=0.1, delta=0.05, seed=None, output="memory", sink=None, memory="tracemalloc"):
+        self.minsup = minsup #minimum support threshold on the full database
+        self.engine = engine #miner run on the sample (and on the full database when the border check fails)
+        self.fraction = fraction #share of the transactions drawn into the sample
+        self.delta = delta #probability allowed for the sample to miss a frequent itemset
+        self.seed = seed
+        self.output = output
+        self.sink = sink
+        self.memory = memory
+        self.encoder = None
+        self.num_transactions = 0
+        self.sample_size = 0
+        self.sample_minsup = 0 #lowered threshold the sample is mined at
+        self.border_size = 0
+        self.border_failures = 0 #border itemsets that are frequent in the full database
+        self.complete = False #the sampled result is guaranteed to hold every frequent itemset
+        self.frequent_itemsets = []
+        self.stats = {}
+
+    # Transactions (sorted tuples of item ids) and the tidlists of the full database, from either layout
+    def load(self, filepath):
+        start_time = time.time()
+        if is_binary(filepath) or "vertical" not in os.path.basename(filepath):
+            self.encoder, transactions = load_horizontal(filepath)
+            tid_lists = defaultdict(set)
+            for tid, transaction in enumerate(transactions):
+                for item in transaction:
+                    tid_lists[item].add(tid)
+        else:
+            self.encoder, tid_lists, num_transactions = load_vertical(filepath)
+            rows = [[] for _ in range(num_transactions)]
+            for item in sorted(tid_lists):
+                for tid in tid_lists[item]:
+                    rows[tid].append(item)
+            transactions = [tuple(row) for row in rows]
+        self.num_transactions = len(transactions)
+        self.stats["load_time"] = time.time() - start_time
+        return transactions, tid_lists
+
+    # Lowered sample threshold: an itemset of relative support s is expected in mu = s × n sampled transactions,
+    # and falls below (1 - e) × mu with probability at most exp(-e² mu / 2) = delta (Chernoff bound)
+    # with no itemset expected in the sample (minsup 0, empty database) every sampled itemset is a candidate
+    def lowered_minsup(self):
+        expected = self.minsup / max(1, self.num_transactions) * self.sample_size
+        if expected <= 0:
+            return 1
+        lowering = math.sqrt(2 * math.log(1 / self.delta) / expected)
+        return max(1, math.floor((1 - lowering) * expected))
+
+    # Mine a random sample of transactions, returns its frequent itemsets as sorted tuples of full-database ids
+    def mine_sample(self, transactions):
+        rng = random.Random(self.seed)
+        self.sample_size = max(1, round(self.fraction * len(transactions)))
+        sample = rng.sample(transactions, self.sample_size)
+        self.sample_minsup = self.lowered_minsup()
+
+        # the sample goes through a binary dataset, which every engine reads
+        labels = self.encoder.labels
+        sample_encoder = ItemEncoder(Counter(labels[item] for transaction in sample for item in transaction))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"sample{BINARY_SUFFIX}")
+            write_binary(path, sample_encoder, (sorted(sample_encoder.encode(labels[item]) for item in transaction) for transaction in sample))
+            miner = mine(self.engine, path, self.sample_minsup, "none")
+        self.stats["sample_mining_time"] = miner.stats["mining_time"]
+        ids = self.encoder.ids
+        return {tuple(sorted(ids[label] for label in miner.encoder.decode(itemset))) for itemset, _ in miner.frequent_itemsets}
+
+    # Exact supports of itemsets over the full database
+    def count(self, itemsets, tid_lists):
+        return count_itemsets(itemsets, tid_lists, self.minsup, self.num_transactions)
+
+    def run(self, filepath):
+        memory_tracker = make_tracker(self.memory)
+        memory_tracker.start()
+        transactions, tid_lists = self.load(filepath)
+
+        if self.sink is None:
+            self.sink = make_sink(self.output, self.output_path(filepath))
+        if isinstance(self.sink, ListSink):
+            self.frequent_itemsets = self.sink.itemsets
+
+        start_time = time.time()
+        sample_frequent = self.mine_sample(transactions)
+        border = negative_border(range(len(self.encoder.labels)), sample_frequent)
+        self.border_size = len(border)
+
+        verify_time = time.time()
+        supports = self.count(sample_frequent.union(border), tid_lists)
+        self.stats["verify_time"] = time.time() - verify_time
+        self.border_failures = sum(1 for itemset in border if supports[itemset] >= self.minsup)
+        self.complete = self.border_failures == 0
+
+        self.sink.open(self.encoder)
+        if self.complete:
+            for itemset, support in sorted(supports.items()):
+                if support >= self.minsup:
+                    self.sink.emit(itemset, support)
+        else:
+            # a frequent itemset outside the sample's may have been missed, mine the full database exactly
+            # (written as a binary dataset, so any engine reads it whatever the input layout)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"full{BINARY_SUFFIX}")
+                write_binary(path, self.encoder, transactions)
+                del transactions, tid_lists
+                miner = mine(self.engine, path, self.minsup, "none")
+            self.stats["rerun_time"] = miner.stats["mining_time"]
+            ids = self.encoder.ids
+            for itemset, support in miner.frequent_itemsets:
+                self.sink.emit(tuple(sorted(ids[label] for label in miner.encoder.decode(itemset))), support)
+        self.sink.close()
+        self.stats["mining_time"] = time.time() - start_time
+        peak_memory = memory_tracker.peak_mb()
+        if peak_memory is not None:
+            self.stats["peak_memory_MB"] = peak_memory
+
+    def output_path(self, input_path):
+        dataset_name = os.path.splitext(os.path.basename(input_path))[0]
+        return f"Results/{dataset_name}_sampling_{self.engine}_{self.minsup}_output.txt"
+
+    def print_results(self, input_path):
+        output_path = self.output_path(input_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # a text sink already streamed the itemsets into the file, only the statistics are left
+        streamed = getattr(self.sink, "path", None) == output_path
+        with open(output_path, "a" if streamed else "w") as f:
+            if not streamed:
+                f.write("== Frequent Itemsets ==\n")
+                self.sink.write_itemsets(f, self.encoder.decode)
+
+            f.write("\n== Execution Statistics ==\n")
+            f.write(f"Transactions: {self.num_transactions}\n")
+            f.write(f"Min Support: {self.minsup}\n")
+            f.write(f"Sample: {self.sample_size} transactions mined with {self.engine} at minsup {self.sample_minsup}\n")
+            f.write(f"Negative Border: {self.border_size} itemsets, {self.border_failures} frequent\n")
+            f.write(f"Complete: {'guaranteed by the border check' if self.complete else 'rerun exactly after the border check failed'}\n")
+            f.write(f"Memory Tracking: {self.memory}\n")
+            for k, v in self.stats.items():
+                label = k.replace("_", " ").title()
+                f.write(f"{label}: {v:.4f} seconds\n" if 'time' in k else f"{label}: {v} MB\n")
+
+        print(f"Results written to: {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python sampling.py <data_file> <minsup> [--engine apriori|eclat|declat|fpgrowth] [--fraction F] [--delta D] [--seed S] [--output text|binary|count]")
+    parser.add_argument("filepath") #horizontal, vertical or binary dataset
+    parser.add_argument("minsup", type=int)
+    parser.add_argument("--engine", choices=ENGINES, default="apriori")
+    parser.add_argument("--fraction", type=float, default=0.1) #share of the transactions in the sample
+    parser.add_argument("--delta", type=float, default=0.05) #allowed probability of a failed border check
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", choices=OUTPUTS[1:], default="text") #itemsets are written while mining
+    parser.add_argument("--memory", choices=MEMORY_TRACKERS, default="tracemalloc")
+    args = parser.parse_args()
+    if args.minsup < 1:
+        parser.error("minsup must be at least 1")
+
+    sampler = Sampler(args.minsup, engine=args.engine, fraction=args.fraction, delta=args.delta, seed=args.seed, output=args.output, memory=args.memory)
+    sampler.run(args.filepath)
+    sampler.print_results(args.filepath)
+    print("Complete: guaranteed" if sampler.complete else f"Border check failed ({sampler.border_failures} frequent border itemsets), rerun exactly")
@@ -0,0 +1,159 @@
+import os
+import struct
+from collections import defaultdict
+
+# Sinks receive frequent itemsets from the miners while mining runs
+# every sink has open(encoder), emit(itemset, support) and close(); itemsets arrive as item ids
+# and write_itemsets(f, decode) fills the "Frequent Itemsets" section of the results file
+
+OUTPUTS = ("memory", "text", "binary", "count")
+
+BUFFER_SIZE = 1 << 20 #bytes buffered by the file sinks before each write
+
+# Keep every itemset in memory (the default when the miners are used as a library)
+class ListSink:
+    def __init__(self):
+        self.itemsets = [] #(itemset, support) pairs
+        self.count = 0
+
+    def open(self, encoder):
+        pass
+
+    def emit(self, itemset, support):
+        self.itemsets.append((itemset, support))
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def write_itemsets(self, f, decode):
+        for itemset, support in self.itemsets:
+            f.write(f"{' '.join(decode(itemset))} ({support})\n")
+
+# Stream "labels (support)" lines straight into the results file through a buffered writer
+class TextSink:
+    def __init__(self, path, header=""):
+        self.path = path
+        self.header = header #written before the itemsets, e.g. the command section
+        self.count = 0
+        self.file = None
+        self.decode = None
+
+    def open(self, encoder):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.decode = encoder.decode
+        self.file = open(self.path, "w", buffering=BUFFER_SIZE)
+        self.file.write(self.header)
+        self.file.write("== Frequent Itemsets ==\n")
+        self.file.flush() #nothing buffered when worker processes fork
+
+    def emit(self, itemset, support):
+        self.file.write(f"{' '.join(self.decode(itemset))} ({support})\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def write_itemsets(self, f, decode):
+        f.write(f"Itemsets streamed to: {self.path} ({self.count} itemsets)\n")
+
+# Compact binary stream: a header with the item dictionary, then one record per itemset
+#   header: b"AAFI", version (uint16), number of labels (uint32), then each label as uint16 length + utf-8
+#   record: itemset size (uint16), support (uint32), item ids (uint32 each), little endian
+class BinarySink:
+    MAGIC = b"AAFI"
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = None
+
+    def open(self, encoder):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "wb", buffering=BUFFER_SIZE)
+        self.file.write(self.MAGIC + struct.pack("<HI", self.VERSION, len(encoder.labels)))
+        for label in encoder.labels:
+            data = label.encode("utf-8")
+            self.file.write(struct.pack("<H", len(data)) + data)
+        self.file.flush() #nothing buffered when worker processes fork
+
+    def emit(self, itemset, support):
+        self.file.write(struct.pack(f"<HI{len(itemset)}I", len(itemset), support, *itemset))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def write_itemsets(self, f, decode):
+        f.write(f"Itemsets written to: {self.path} ({self.count} itemsets)\n")
+
+# Read back a BinarySink file as (labels, support) pairs
+def read_binary(path):
+    with open(path, "rb", buffering=BUFFER_SIZE) as f:
+        if f.read(4) != BinarySink.MAGIC:
+            raise ValueError(f"{path} is not a binary itemset file")
+        _, num_labels = struct.unpack("<HI", f.read(6))
+        labels = []
+        for _ in range(num_labels):
+            (length,) = struct.unpack("<H", f.read(2))
+            labels.append(f.read(length).decode("utf-8"))
+
+        while True:
+            record = f.read(6)
+            if not record:
+                break
+            size, support = struct.unpack("<HI", record)
+            itemset = struct.unpack(f"<{size}I", f.read(4 * size))
+            yield [labels[item_id] for item_id in itemset], support
+
+# Only count the itemsets, by size
+class CountSink:
+    def __init__(self):
+        self.count = 0
+        self.by_size = defaultdict(int) #itemset size -> number of itemsets
+
+    def open(self, encoder):
+        pass
+
+    def emit(self, itemset, support):
+        self.count += 1
+        self.by_size[len(itemset)] += 1
+
+    def close(self):
+        pass
+
+    def write_itemsets(self, f, decode):
+        f.write(f"Itemsets counted: {self.count}\n")
+        for size in sorted(self.by_size):
+            f.write(f"Size {size}: {self.by_size[size]}\n")
+
+# Hand every itemset, decoded to labels, to a user function callback(labels, support)
+class CallbackSink:
+    def __init__(self, callback):
+        self.callback = callback
+        self.count = 0
+        self.decode = None
+
+    def open(self, encoder):
+        self.decode = encoder.decode
+
+    def emit(self, itemset, support):
+        self.callback(self.decode(itemset), support)
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def write_itemsets(self, f, decode):
+        f.write(f"Itemsets passed to callback: {self.count}\n")
+
+# Build the sink for an --output choice, results_path is the miner's text results file
+def make_sink(output, results_path, header=""):
+    if output == "text":
+        return TextSink(results_path, header)
+    if output == "binary":
+        return BinarySink(os.path.splitext(results_path)[0] + ".bin")
+    if output == "count":
+        return CountSink()
+    return ListSink()
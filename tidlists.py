@@ -0,0 +1,61 @@
+# Tidlist backends for the vertical miners
+# every backend turns a set of dense TIDs (0..N-1) into its own representation,
+# intersects two tidlists with & and reports the support of a tidlist
+# key() gives a hashable value that is equal for equal tidlists (for closed itemset checks)
+
+BACKENDS = ("set", "bitset", "auto")
+
+# above this average density (support / transactions) of the frequent items bitsets win,
+# on retail the crossover sits between minsup 50 (density 0.0024) and 200 (0.0069)
+AUTO_BITSET_DENSITY = 0.005
+
+# Tidlists kept as Python sets, intersections cost O(min(|a|, |b|)) hash probes
+class SetTidlists:
+    name = "set"
+
+    def __init__(self, num_transactions):
+        self.num_transactions = num_transactions
+
+    def convert(self, tids):
+        return tids
+
+    def support(self, tidlist):
+        return len(tidlist)
+
+    def key(self, tidlist):
+        return sum(tidlist)
+
+# Tidlists packed into the bits of a Python int (bit t is set when TID t is in the list)
+# intersections are a bitwise AND and supports a popcount over N/8 bytes
+class BitsetTidlists:
+    name = "bitset"
+
+    def __init__(self, num_transactions):
+        self.num_transactions = num_transactions
+
+    def convert(self, tids):
+        bits = bytearray((self.num_transactions + 7) // 8)
+        for tid in tids:
+            bits[tid >> 3] |= 1 << (tid & 7)
+        return int.from_bytes(bits, "little")
+
+    def support(self, tidlist):
+        return tidlist.bit_count()
+
+    def key(self, tidlist):
+        return tidlist
+
+# Average density of the tidlists that pass minsup
+def density(tid_lists, minsup, num_transactions):
+    supports = [len(tids) for tids in tid_lists if len(tids) >= minsup]
+    if not supports or not num_transactions:
+        return 0.0
+    return sum(supports) / (len(supports) * num_transactions)
+
+# Pick the backend for a name, "auto" chooses bitsets on dense data
+def make_backend(name, tid_lists, minsup, num_transactions):
+    if name == "auto":
+        name = "bitset" if density(tid_lists, minsup, num_transactions) >= AUTO_BITSET_DENSITY else "set"
+    if name == "bitset":
+        return BitsetTidlists(num_transactions)
+    return SetTidlists(num_transactions)